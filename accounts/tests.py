@@ -1,3 +1,45 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.urls import reverse
 
-# Create your tests here.
+from store.testing import QueryBudgetTestCase
+
+User = get_user_model()
+
+
+class AccountsQueryBudgetTests(QueryBudgetTestCase):
+
+    def make_users(self, n):
+        User.objects.bulk_create(User(username=f"membre-{self.seeded + i}") for i in range(n))
+        self.seeded += n
+
+    def setUp(self):
+        super().setUp()
+        self.seeded = 0
+
+    def test_register_page(self):
+        self.assertQueryBudgetStable(self.make_users, lambda: self.client.get(reverse('accounts:register')))
+
+    def test_register_submit(self):
+        def register():
+            username = f"nouveau-{self.seeded}-{User.objects.count()}"
+            return self.client.post(reverse('accounts:register'), {
+                'username': username, 'email': f"{username}@example.com", 'phone': '0600000000',
+                'password1': 'Tres-Secret-2025', 'password2': 'Tres-Secret-2025',
+            })
+
+        self.assertQueryBudgetStable(self.make_users, register)
+
+    def test_login(self):
+        self.assertQueryBudgetStable(
+            self.make_users,
+            lambda: self.client.post(reverse('accounts:login'), {
+                'username': 'client', 'password': 'motdepasse-123',
+            }),
+        )
+
+    def test_logout(self):
+        def logout():
+            self.client.force_login(self.user)
+            return self.client.post(reverse('accounts:logout'))
+
+        self.assertQueryBudgetStable(self.make_users, logout)
@@ -3,6 +3,9 @@ ASGI config for ecom project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Le flux SSE prix/stock (store/live.py) n'est servi que par cette application :
+    uvicorn config.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -11,6 +14,11 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecom.settings')
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Préchauffage avant la première requête du processus (store/warmup.py)
+from store.warmup import warm_on_startup  # noqa: E402
+
+warm_on_startup()
@@ -71,6 +71,31 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Accélérateur partagé des sessions (la table django_session fait foi) : désactivé
+    # par défaut, RedisCache en production ; jamais un cache propre au processus (store.E003)
+    "sessions": {
+        "BACKEND": os.getenv("SESSION_CACHE_BACKEND", "django.core.cache.backends.dummy.DummyCache"),
+        "LOCATION": os.getenv("SESSION_CACHE_LOCATION", ""),
+    },
+    # Pages catalogue et leur compteur de génération : doit être partagé par tous les
+    # workers (fichiers sur un seul hôte ; RedisCache dès qu'il y a plusieurs hôtes)
+    "pages": {
+        "BACKEND": os.getenv("PAGE_CACHE_BACKEND", "django.core.cache.backends.filebased.FileBasedCache"),
+        "LOCATION": os.getenv("PAGE_CACHE_LOCATION", str(BASE_DIR / "cache" / "pages")),
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    },
+}
+
+# Sessions : LRU local au processus (invités) devant la base, écriture seulement si modifiée
+SESSION_ENGINE = "store.sessions"
+SESSION_CACHE_ALIAS = "sessions"
+SESSION_LOCAL_CACHE_SIZE = 10000
+SESSION_LOCAL_CACHE_TTL = 5  # secondes ; borne la fraîcheur vis-à-vis des autres processus
+
 # Password validation (par défaut)
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -94,8 +119,21 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Envoi des médias par le serveur frontal : "X-Accel-Redirect" (nginx) ou "X-Sendfile" ;
+# "" (lecture par le worker) n'est accepté qu'avec DEBUG (store.E002)
+MEDIA_SENDFILE_HEADER = os.getenv("MEDIA_SENDFILE_HEADER", "")
+MEDIA_ACCEL_PREFIX = "/protected-media/"   # location nginx `internal` avec alias vers MEDIA_ROOT
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 365
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Sitemap & flux produits (pré-construits par `manage.py build_feeds`)
+SITE_URL = os.getenv("SITE_URL", "http://127.0.0.1:8000")
+FEEDS_ROOT = BASE_DIR / "feeds"
+SITEMAP_SHARD_SIZE = 10000   # le protocole autorise 50 000 URLs par fichier
+FEED_CHUNK_SIZE = 2000
+FEED_CURRENCY = "MAD"
+
 # Auth custom user (on crée accounts.User)
 #AUTH_USER_MODEL = "accounts.User"
 AUTH_USER_MODEL = 'accounts.CustomUser'
@@ -104,5 +142,44 @@ AUTH_USER_MODEL = 'accounts.CustomUser'
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = "/"
 
+# Cache pleine page du catalogue (visiteurs anonymes)
+PAGE_CACHE_ALIAS = "pages"
+PAGE_CACHE_TIMEOUT = 60 * 15
+
+# Autocomplétion : reconstruction complète de l'index en mémoire (secondes)
+SEARCH_INDEX_TTL = 60 * 5
+# Au plus N suggestions par requête ; un préfixe couvrant plus de SEARCH_SCAN_LIMIT clés
+# garde sa tête de classement précalculée au lieu d'être parcouru
+SEARCH_SUGGESTIONS_MAX = 20
+SEARCH_SCAN_LIMIT = 256
+
+# Panier : durée de mémorisation des clés d'idempotence (double-submit / retry)
+CART_IDEMPOTENCY_TIMEOUT = 60 * 60
+
+# Commandes : livrées/annulées depuis N jours -> tables d'archive (manage.py archive_orders)
+ORDER_ARCHIVE_AFTER_DAYS = 180
+ORDER_ARCHIVE_BATCH_SIZE = 500
+ORDERS_PER_PAGE = 10
+
+# Préchauffage (manage.py warm_caches, et au démarrage de chaque processus WSGI/ASGI)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", str(not DEBUG)) == "True"
+WARMUP_PRODUCT_PAGES = 50
+WARMUP_SALES_DAYS = 30
+WARMUP_THREADS = 4
+WARMUP_HTTP_TIMEOUT = 30  # secondes par page (manage.py warm_caches)
+
+# Flux SSE prix/stock (store/live.py, servi par l'application ASGI)
+LIVE_POLL_INTERVAL = 2          # secondes entre deux lectures des produits modifiés
+LIVE_POLL_OVERLAP = 10          # secondes relues à chaque tick (transactions lentes)
+LIVE_MAX_CONNECTIONS = 10000    # par processus
+LIVE_QUEUE_SIZE = 32            # événements en attente par connexion avant resync
+LIVE_MAX_PRODUCTS = 50          # produits suivis par connexion
+LIVE_KEEPALIVE = 15
+LIVE_RETRY_MS = 5000
+
+# Mises à jour de prix/stock en masse (store/pricing.py) : produits par transaction
+BULK_UPDATE_BATCH_SIZE = 1000
+
 # Email dev (console) -> en prod, configure SMTP
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+
@@ -0,0 +1,23 @@
+# config/test_settings.py
+"""Réglages des tests : SQLite et caches en mémoire, sans serveur MySQL ni cache sur disque.
+
+    python manage.py test --settings=config.test_settings
+    DJANGO_SETTINGS_MODULE=config.test_settings pytest      # avec pytest-django
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, CACHES
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+    }
+}
+
+# Un LocMemCache distinct par alias : chaque test repart de caches vides
+CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"test-{alias}"}
+    for alias in CACHES
+}
+
+WARMUP_ON_STARTUP = False
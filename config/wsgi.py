@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Préchauffage avant la première requête du processus (store/warmup.py)
+from store.warmup import warm_on_startup  # noqa: E402
+
+warm_on_startup()
@@ -1,6 +1,16 @@
 # store/admin.py
+from io import TextIOWrapper
+
 from django.contrib import admin
-from .models import Category, Product, Cart, CartItem, Order, OrderItem
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.admin.utils import unquote
+from django.core.exceptions import ValidationError
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+
+from .forms import BulkPriceUpdateForm
+from .pricing import BulkUpdateReport, apply_updates, read_price_file, reprice
+from .models import Category, Product, Cart, CartItem, Order, OrderItem, ArchivedOrder, ArchivedOrderItem
 
 
 @admin.register(Category)
@@ -17,16 +27,65 @@ class ProductAdmin(admin.ModelAdmin):
     list_editable = ['price', 'stock', 'available']
     prepopulated_fields = {'slug': ('name',)}
     search_fields = ['name', 'description']
+    actions = ['bulk_update_prices']
+
+    @admin.action(description="Mettre à jour prix / stock en masse")
+    def bulk_update_prices(self, request, queryset):
+        """Diff + bulk_update par lots (store/pricing.py), au lieu d'un save() par ligne"""
+        if 'apply' in request.POST:
+            form = BulkPriceUpdateForm(request.POST, request.FILES)
+            if form.is_valid():
+                report = BulkUpdateReport()
+                if form.cleaned_data['price_file']:
+                    fh = TextIOWrapper(form.cleaned_data['price_file'], encoding='utf-8-sig', newline='')
+                    updates = read_price_file(fh, report)
+                    selected = set(queryset.filter(slug__in=list(updates)).values_list('slug', flat=True))
+                    updates = {slug: values for slug, values in updates.items() if slug in selected}
+                else:
+                    updates = reprice(queryset, form.cleaned_data['percent'])
+                apply_updates(updates, report=report)
+                self.message_user(request, (
+                    f"{report.changed} produit(s) modifié(s), {report.unchanged} inchangé(s), "
+                    f"{report.batches} lot(s)."
+                ))
+                for error in report.errors[:20]:
+                    self.message_user(request, f"Rejetée : {error}", level='warning')
+                return None
+        else:
+            form = BulkPriceUpdateForm()
+
+        return TemplateResponse(request, 'admin/store/product/bulk_update_prices.html', {
+            **self.admin_site.each_context(request),
+            'title': "Mise à jour des prix et stocks",
+            'opts': self.model._meta,
+            'form': form,
+            'selected': request.POST.getlist(ACTION_CHECKBOX_NAME),
+            'select_across': request.POST.get('select_across', '0'),
+            'count': queryset.count(),
+        })
 
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        # Une seule requête pour les choix « produit », partagés par toutes les lignes
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'product':
+            if not hasattr(request, '_product_choices'):
+                request._product_choices = list(field.choices)
+            field.choices = request._product_choices
+        return field
+
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['id', 'user', 'created_at']  # Supprimez 'get_items_count' pour l'instant
+    list_select_related = ['user']
     inlines = [CartItemInline]
 
 
@@ -35,6 +94,9 @@ class OrderItemInline(admin.TabularInline):
     extra = 0
     readonly_fields = ['product', 'price', 'quantity']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
@@ -42,4 +104,47 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ['status', 'created_at']
     list_editable = ['status']
     inlines = [OrderItemInline]
-    readonly_fields = ['user', 'total', 'created_at', 'updated_at']
\ No newline at end of file
+    readonly_fields = ['user', 'total', 'created_at', 'updated_at']
+
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        """Une commande archivée depuis reste joignable à son adresse d'origine"""
+        if self.get_object(request, unquote(object_id)) is None:
+            try:
+                archived = ArchivedOrder.objects.filter(pk=unquote(object_id)).exists()
+            except (ValueError, ValidationError):
+                archived = False
+            if archived:
+                return redirect('admin:store_archivedorder_change', object_id)
+        return super().change_view(request, object_id, form_url, extra_context)
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ['product', 'price', 'quantity']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(admin.ModelAdmin):
+    """Archive en lecture seule : les commandes n'y arrivent que par `archive_orders`.
+
+    La liste des commandes ne lit que la table chaude ; une commande archivée
+    ouverte depuis son ancienne adresse (OrderAdmin) est redirigée ici.
+    """
+    list_display = ['id', 'user', 'status', 'total', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['id', 'email', 'last_name']
+    inlines = [ArchivedOrderItemInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
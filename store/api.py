@@ -0,0 +1,228 @@
+# store/api.py
+"""API JSON légère pour l'application mobile : catalogue et panier.
+
+- `?fields=id,name,price` limite les champs renvoyés (et les colonnes lues) ;
+- les mutations du panier sont envoyées par lot dans un seul POST et le
+  panier (articles + total) est renvoyé recalculé dans la même réponse ;
+- le panier est lié au cookie de session : la protection CSRF de Django
+  s'applique. Le GET du panier dépose le cookie `csrftoken`, dont la valeur
+  est renvoyée dans l'en-tête `X-CSRFToken` de chaque POST.
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_GET, require_http_methods
+
+from .models import Product, Category
+from .search import prefix_index
+from .views import (
+    get_or_create_cart, claim_idempotency_key,
+    add_product_to_cart, change_cart_item_quantity, remove_cart_item,
+)
+
+# champ exposé -> (colonnes à charger, sérialisation)
+PRODUCT_FIELDS = {
+    'id': ((), lambda p: p.id),
+    'name': (('name',), lambda p: p.name),
+    'slug': (('slug',), lambda p: p.slug),
+    'price': (('price',), lambda p: p.price),
+    'stock': (('stock',), lambda p: p.stock),
+    'available': (('available',), lambda p: p.available),
+    'description': (('description',), lambda p: p.description),
+    'category': (('category__slug',), lambda p: p.category.slug),
+    'image': (('image',), lambda p: p.image.url if p.image else None),
+    'url': (('slug',), lambda p: p.get_absolute_url()),
+}
+DEFAULT_PRODUCT_FIELDS = ['id', 'name', 'slug', 'price', 'image']
+MAX_PAGE_SIZE = 100
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def api_response(data, status=200):
+    """JSON compact : pas d'indentation ni d'espaces superflus"""
+    return JsonResponse(data, status=status, json_dumps_params={'separators': (',', ':')})
+
+
+def api_view(view):
+    """Convertit les erreurs en réponses JSON au lieu de pages HTML"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as exc:
+            return api_response({'error': str(exc)}, status=exc.status)
+        except Http404 as exc:
+            return api_response({'error': str(exc) or "Introuvable."}, status=404)
+    return wrapper
+
+
+def int_param(request, name, default, minimum, maximum=None):
+    """Paramètre entier borné ; ApiError (400) s'il est invalide ou hors bornes"""
+    try:
+        value = int(request.GET.get(name, default))
+    except ValueError:
+        raise ApiError(f"`{name}` doit être un entier.")
+    if value < minimum or (maximum is not None and value > maximum):
+        bounds = f"entre {minimum} et {maximum}" if maximum is not None else f"au moins {minimum}"
+        raise ApiError(f"`{name}` doit être {bounds}.")
+    return value
+
+
+def requested_fields(request):
+    raw = request.GET.get('fields')
+    if not raw:
+        return DEFAULT_PRODUCT_FIELDS
+    fields = [f for f in raw.split(',') if f]
+    unknown = set(fields) - set(PRODUCT_FIELDS)
+    if unknown:
+        raise ApiError(f"Champs inconnus : {', '.join(sorted(unknown))}")
+    return fields
+
+
+def sparse_products(queryset, fields):
+    """Ne charge que les colonnes nécessaires aux champs demandés"""
+    columns = {col for f in fields for col in PRODUCT_FIELDS[f][0]}
+    if 'category__slug' in columns:
+        queryset = queryset.select_related('category')
+    return queryset.only(*columns) if columns else queryset.only('id')
+
+
+def serialize_product(product, fields):
+    return {f: PRODUCT_FIELDS[f][1](product) for f in fields}
+
+
+def serialize_cart(cart):
+    """Articles et total recalculés en une seule requête"""
+    items = cart.items.select_related('product').only(
+        'cart', 'quantity', 'product__name', 'product__slug', 'product__price'
+    ).order_by('id')
+    lines = []
+    total = 0
+    count = 0
+    for item in items:
+        subtotal = item.get_subtotal()
+        total += subtotal
+        count += item.quantity
+        lines.append({
+            'id': item.id,
+            'product': item.product.slug,
+            'name': item.product.name,
+            'price': item.product.price,
+            'quantity': item.quantity,
+            'subtotal': subtotal,
+        })
+    return {'items': lines, 'count': count, 'total': total}
+
+
+@require_GET
+@api_view
+def product_list(request):
+    """Liste paginée des produits disponibles (filtres `category`, `q`)"""
+    fields = requested_fields(request)
+    products = Product.objects.filter(available=True)
+
+    category_slug = request.GET.get('category')
+    if category_slug:
+        category = get_object_or_404(Category, slug=category_slug)
+        products = products.filter(category=category)
+
+    query = request.GET.get('q')
+    if query:
+        products = products.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        )
+
+    limit = int_param(request, 'limit', 20, 1, MAX_PAGE_SIZE)
+    offset = int_param(request, 'offset', 0, 0)
+
+    # Une ligne de plus que demandé indique s'il reste une page, sans COUNT(*)
+    page = list(sparse_products(products, fields)[offset:offset + limit + 1])
+    return api_response({
+        'results': [serialize_product(p, fields) for p in page[:limit]],
+        'next_offset': offset + limit if len(page) > limit else None,
+    })
+
+
+@require_GET
+@api_view
+def product_detail(request, slug):
+    fields = requested_fields(request)
+    product = get_object_or_404(sparse_products(Product.objects.all(), fields), slug=slug, available=True)
+    return api_response(serialize_product(product, fields))
+
+
+@require_GET
+@api_view
+def autocomplete(request):
+    """Suggestions pour la barre de recherche, servies par l'index en mémoire"""
+    limit = int_param(request, 'limit', 8, 1, settings.SEARCH_SUGGESTIONS_MAX)
+    return api_response({'suggestions': prefix_index.suggest(request.GET.get('q', ''), limit)})
+
+
+def apply_cart_operation(cart, op):
+    action = op.get('op')
+    if action in ('update', 'remove') and not isinstance(op.get('item'), int):
+        raise ApiError("`item` doit être l'id d'un article du panier.")
+    if action == 'add':
+        product = get_object_or_404(Product, slug=op.get('product'), available=True)
+        quantity = op.get('quantity', 1)
+        if not isinstance(quantity, int) or quantity < 1:
+            raise ApiError("`quantity` doit être un entier positif.")
+        add_product_to_cart(cart, product, quantity)
+    elif action == 'update':
+        delta = op.get('delta')
+        if not isinstance(delta, int):
+            raise ApiError("`delta` doit être un entier.")
+        change_cart_item_quantity(cart, op.get('item'), delta)
+    elif action == 'remove':
+        remove_cart_item(cart, op.get('item'))
+    else:
+        raise ApiError(f"Opération inconnue : {action!r}")
+
+
+@require_http_methods(['GET', 'POST'])
+@ensure_csrf_cookie
+@api_view
+def cart(request):
+    """GET : contenu du panier. POST : lot d'opérations appliqué en une transaction.
+
+    Corps attendu : {"ops": [{"op": "add", "product": "<slug>", "quantity": 2},
+                             {"op": "update", "item": 12, "delta": -1},
+                             {"op": "remove", "item": 7}]}
+    Un en-tête `Idempotency-Key` rend le renvoi d'un même lot sans effet.
+    Le POST exige l'en-tête `X-CSRFToken` (valeur du cookie `csrftoken`).
+    """
+    cart = get_or_create_cart(request, create=request.method == 'POST')
+    if cart is None:
+        return api_response({'items': [], 'count': 0, 'total': 0})
+
+    if request.method == 'POST':
+        try:
+            ops = json.loads(request.body).get('ops')
+        except (ValueError, AttributeError):
+            raise ApiError("Corps JSON invalide.")
+        if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+            raise ApiError("`ops` doit être une liste d'opérations.")
+
+        key = request.headers.get('Idempotency-Key')
+        # Une opération en erreur annule tout le lot, clé d'idempotence comprise
+        with transaction.atomic():
+            if claim_idempotency_key(cart, key, scope='api'):
+                for index, op in enumerate(ops):
+                    try:
+                        apply_cart_operation(cart, op)
+                    except (ApiError, Http404) as exc:
+                        raise ApiError(f"Opération {index} : {exc}", getattr(exc, 'status', 404))
+
+    return api_response(serialize_cart(cart))
@@ -0,0 +1,97 @@
+# store/archive.py
+"""Partition chaude/froide des commandes.
+
+Les commandes livrées ou annulées plus anciennes que ORDER_ARCHIVE_AFTER_DAYS
+sont déplacées par lots transactionnels vers ArchivedOrder/ArchivedOrderItem :
+les tables Order/OrderItem et leurs index restent petits. L'historique fusionne
+les deux tables par date : une vieille commande encore en cours reste active et
+doit s'intercaler entre les commandes archivées.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+ARCHIVABLE_STATUSES = ['delivered', 'cancelled']
+ORDER_FIELDS = [f.attname for f in Order._meta.concrete_fields]
+ITEM_FIELDS = [f.attname for f in OrderItem._meta.concrete_fields]
+
+
+def archivable_orders(older_than_days=None):
+    days = settings.ORDER_ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_batch(ids):
+    """Copie puis supprime un lot de commandes, dans une seule transaction"""
+    with transaction.atomic():
+        orders = list(
+            Order.objects.select_for_update().filter(id__in=ids, status__in=ARCHIVABLE_STATUSES)
+            .values(*ORDER_FIELDS)
+        )
+        ids = [order['id'] for order in orders]
+        ArchivedOrder.objects.bulk_create(ArchivedOrder(**order) for order in orders)
+        ArchivedOrderItem.objects.bulk_create(
+            ArchivedOrderItem(**item)
+            for item in OrderItem.objects.filter(order_id__in=ids).values(*ITEM_FIELDS)
+        )
+        Order.objects.filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_orders(older_than_days=None, batch_size=None):
+    """Archive toutes les commandes éligibles, lot par lot ; retourne le nombre archivé.
+
+    Chaque lot est une transaction courte : les verrous ne couvrent jamais toute la table.
+    """
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    queryset = archivable_orders(older_than_days).order_by('id').values_list('id', flat=True)
+    archived = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id)[:batch_size])
+        if not ids:
+            return archived
+        archived += archive_batch(ids)
+        last_id = ids[-1]
+
+
+def find_user_order(user, order_id):
+    """Commande active ou archivée (l'archivage garde l'id) ; None si elle n'existe pas"""
+    return (
+        Order.objects.filter(id=order_id, user=user).first()
+        or ArchivedOrder.objects.filter(id=order_id, user=user).first()
+    )
+
+
+def order_keys(queryset, limit):
+    return list(queryset.order_by('-created_at', '-id').values_list('created_at', 'id')[:limit])
+
+
+def user_orders_page(user, page, per_page):
+    """Une page de l'historique, commandes actives et archivées fusionnées par date.
+
+    Retourne (commandes, il_y_a_une_page_suivante). Les deux tables sont lues sur
+    la même fenêtre (dates et ids seulement, par l'index (user, -created_at)),
+    puis seules les commandes de la page sont chargées avec leurs articles.
+    """
+    offset = (page - 1) * per_page
+    window = offset + per_page + 1
+    merged = sorted(
+        [(created_at, pk, False) for created_at, pk in order_keys(Order.objects.filter(user=user), window)]
+        + [(created_at, pk, True) for created_at, pk in order_keys(ArchivedOrder.objects.filter(user=user), window)],
+        reverse=True,
+    )
+    selected = merged[offset:offset + per_page]
+
+    loaded = {}
+    for model, archived in ((Order, False), (ArchivedOrder, True)):
+        ids = [pk for _, pk, is_archived in selected if is_archived == archived]
+        if ids:
+            for order in model.objects.filter(id__in=ids).prefetch_related('items__product'):
+                loaded[(archived, order.id)] = order
+    return [loaded[(archived, pk)] for _, pk, archived in selected], len(merged) > offset + per_page
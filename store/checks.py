@@ -0,0 +1,50 @@
+# store/checks.py
+"""Vérifications de configuration pour la production (`manage.py check --deploy`)"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def is_process_local(alias):
+    return settings.CACHES[alias]['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_page_cache_shared(app_configs, **kwargs):
+    if is_process_local(settings.PAGE_CACHE_ALIAS):
+        return [Error(
+            f"Le cache '{settings.PAGE_CACHE_ALIAS}' (PAGE_CACHE_ALIAS) est propre au processus.",
+            hint="Les invalidations d'un worker ne seraient pas vues par les autres : "
+                 "utilisez un cache fichiers, base de données ou Redis.",
+            id='store.E001',
+        )]
+    return []
+
+
+@register(Tags.caches, deploy=True)
+def check_session_cache_shared(app_configs, **kwargs):
+    backend = settings.CACHES[settings.SESSION_CACHE_ALIAS]['BACKEND']
+    if backend == 'django.core.cache.backends.locmem.LocMemCache':
+        return [Error(
+            f"Le cache '{settings.SESSION_CACHE_ALIAS}' (SESSION_CACHE_ALIAS) est propre au processus.",
+            hint="Une déconnexion sur un worker ne serait pas vue par les autres : "
+                 "utilisez RedisCache, ou DummyCache pour lire les sessions en base.",
+            id='store.E003',
+        )]
+    return []
+
+
+@register(Tags.security, deploy=True)
+def check_media_sendfile(app_configs, **kwargs):
+    if not settings.DEBUG and not settings.MEDIA_SENDFILE_HEADER:
+        return [Error(
+            "MEDIA_SENDFILE_HEADER est vide : les images seraient lues et envoyées par les workers.",
+            hint="Définissez MEDIA_SENDFILE_HEADER=X-Accel-Redirect (nginx) ou X-Sendfile "
+                 "(Apache/lighttpd) et configurez le serveur frontal en conséquence.",
+            id='store.E002',
+        )]
+    return []
@@ -0,0 +1,151 @@
+# store/feeds.py
+"""Génération en flux du sitemap et du flux produits marchand.
+
+Les documents sont produits par des générateurs qui parcourent le catalogue
+avec `iterator(chunk_size=...)` : ils peuvent être envoyés tels quels dans une
+StreamingHttpResponse ou écrits sur disque (gzip) par `manage.py build_feeds`.
+"""
+import gzip
+import json
+import os
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.urls import reverse
+
+from .models import Product
+
+SITEMAP_NS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+GOOGLE_NS = "http://base.google.com/ns/1.0"
+MANIFEST_NAME = "manifest.json"
+
+
+def feeds_root():
+    return Path(settings.FEEDS_ROOT)
+
+
+def shard_of(product_id):
+    """Les shards sont des tranches d'ids : un produit ne change jamais de shard"""
+    return (product_id - 1) // settings.SITEMAP_SHARD_SIZE
+
+
+def shard_filename(shard):
+    return f"sitemap-{shard}.xml.gz"
+
+
+def available_products():
+    return Product.objects.filter(available=True).order_by('id')
+
+
+def scan_shards():
+    """Un seul parcours des ids : {shard: (nombre de produits, dernier updated_at)}"""
+    shards = {}
+    rows = available_products().values_list('id', 'updated_at').iterator(
+        chunk_size=settings.FEED_CHUNK_SIZE
+    )
+    for product_id, updated_at in rows:
+        shard = shard_of(product_id)
+        count, last = shards.get(shard, (0, None))
+        shards[shard] = (count + 1, max(last, updated_at) if last else updated_at)
+    return {shard: (count, last.isoformat()) for shard, (count, last) in shards.items()}
+
+
+def iter_sitemap_index(base_url, shards):
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for shard in sorted(shards):
+        loc = base_url + reverse('store:sitemap_shard', args=[shard])
+        yield f"<sitemap><loc>{escape(loc)}</loc><lastmod>{shards[shard][1]}</lastmod></sitemap>\n"
+    yield '</sitemapindex>\n'
+
+
+def iter_sitemap_shard(base_url, shard):
+    size = settings.SITEMAP_SHARD_SIZE
+    products = available_products().filter(
+        id__gt=shard * size, id__lte=(shard + 1) * size
+    ).only('slug', 'updated_at')
+
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<urlset xmlns="{SITEMAP_NS}">\n'
+    for product in products.iterator(chunk_size=settings.FEED_CHUNK_SIZE):
+        loc = base_url + product.get_absolute_url()
+        yield (
+            f"<url><loc>{escape(loc)}</loc>"
+            f"<lastmod>{product.updated_at.isoformat()}</lastmod></url>\n"
+        )
+    yield '</urlset>\n'
+
+
+def iter_product_feed(base_url):
+    """Flux RSS 2.0 au format Google Merchant"""
+    products = available_products().select_related('category').only(
+        'name', 'slug', 'description', 'price', 'image', 'stock', 'category__name'
+    )
+
+    yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+    yield f'<rss version="2.0" xmlns:g="{GOOGLE_NS}"><channel>\n'
+    yield f"<title>Fashion Store</title><link>{escape(base_url)}/</link>\n"
+    for product in products.iterator(chunk_size=settings.FEED_CHUNK_SIZE):
+        image = (
+            f"<g:image_link>{escape(base_url + product.image.url)}</g:image_link>"
+            if product.image else ""
+        )
+        availability = "in stock" if product.stock > 0 else "out of stock"
+        yield (
+            "<item>"
+            f"<g:id>{product.id}</g:id>"
+            f"<title>{escape(product.name)}</title>"
+            f"<description>{escape(product.description)}</description>"
+            f"<link>{escape(base_url + product.get_absolute_url())}</link>"
+            f"{image}"
+            f"<g:price>{product.price} {settings.FEED_CURRENCY}</g:price>"
+            f"<g:availability>{availability}</g:availability>"
+            f"<g:product_type>{escape(product.category.name)}</g:product_type>"
+            "</item>\n"
+        )
+    yield '</channel></rss>\n'
+
+
+def write_gzip(path, chunks):
+    """Écrit un document compressé de façon atomique (fichier temporaire + rename)"""
+    tmp = path.with_suffix(path.suffix + '.tmp')
+    with gzip.open(tmp, 'wt', encoding='utf-8') as fh:
+        for chunk in chunks:
+            fh.write(chunk)
+    os.replace(tmp, path)
+
+
+def load_manifest():
+    try:
+        with open(feeds_root() / MANIFEST_NAME) as fh:
+            return {int(k): tuple(v) for k, v in json.load(fh).items()}
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def build_feeds(base_url=None, force=False):
+    """Reconstruit l'index, les shards modifiés depuis le dernier build et le flux produits.
+
+    Retourne la liste des shards régénérés.
+    """
+    base_url = (base_url or settings.SITE_URL).rstrip('/')
+    root = feeds_root()
+    root.mkdir(parents=True, exist_ok=True)
+
+    previous = {} if force else load_manifest()
+    shards = scan_shards()
+    changed = [shard for shard in sorted(shards) if previous.get(shard) != shards[shard]]
+
+    for shard in changed:
+        write_gzip(root / shard_filename(shard), iter_sitemap_shard(base_url, shard))
+    for shard in set(previous) - set(shards):
+        (root / shard_filename(shard)).unlink(missing_ok=True)
+
+    write_gzip(root / 'sitemap.xml.gz', iter_sitemap_index(base_url, shards))
+    if changed or force or not (root / 'products.xml.gz').exists():
+        write_gzip(root / 'products.xml.gz', iter_product_feed(base_url))
+
+    with open(root / MANIFEST_NAME, 'w') as fh:
+        json.dump(shards, fh)
+    return changed
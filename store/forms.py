@@ -1,4 +1,6 @@
 # store/forms.py
+import uuid
+
 from django import forms
 from .models import Order
 
@@ -25,4 +27,33 @@ class AddToCartForm(forms.Form):
             'class': 'form-control',
             'style': 'width: 80px;'
         })
-    )
\ No newline at end of file
+    )
+    # Jeton généré à l'affichage : un double-submit ou un retry le renvoie à l'identique
+    idempotency_key = forms.CharField(
+        required=False,
+        max_length=64,
+        initial=lambda: uuid.uuid4().hex,
+        widget=forms.HiddenInput
+    )
+
+class BulkPriceUpdateForm(forms.Form):
+    """Action d'admin : fichier CSV ou variation en pourcentage, appliqués aux produits sélectionnés"""
+    price_file = forms.FileField(
+        required=False,
+        label="Fichier CSV",
+        help_text="Colonnes slug, price, stock, available (séparateur , ou ;). Cellule vide : inchangé."
+    )
+    percent = forms.DecimalField(
+        required=False,
+        label="Variation de prix (%)",
+        max_digits=5,
+        decimal_places=2,
+        min_value=-99,
+        help_text="Ex. -10 pour une remise de 10 %."
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if bool(cleaned_data.get('price_file')) == (cleaned_data.get('percent') is not None):
+            raise forms.ValidationError("Indiquez soit un fichier, soit une variation en pourcentage.")
+        return cleaned_data
@@ -0,0 +1,198 @@
+# store/live.py
+"""Flux server-sent events des changements de prix et de stock (servi par config/asgi.py).
+
+Un seul poller asyncio par processus lit les produits modifiés depuis le dernier
+passage (`Product.updated_at`) : une requête par tick, quel que soit le nombre
+de navigateurs connectés. Les changements de prix, stock ou disponibilité sont
+diffusés aux abonnés des produits concernés.
+
+- chaque connexion a une file bornée (LIVE_QUEUE_SIZE) : un client trop lent
+  reçoit un événement `resync` et la connexion est fermée (EventSource se
+  reconnecte et relit les valeurs courantes) ;
+- au plus LIVE_MAX_CONNECTIONS connexions par processus, au-delà : 503 ;
+- si le poller échoue (base indisponible...), l'erreur est journalisée et tous
+  les abonnés reçoivent `resync` : leurs reconnexions relancent un poller neuf.
+"""
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Max
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from .models import Product
+
+RESYNC = "event: resync\ndata: {}\n\n"
+LIVE_FIELDS = ('price', 'stock', 'available')
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    def __init__(self, product_ids):
+        self.product_ids = frozenset(product_ids)
+        self.queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.closed = False
+
+    def offer(self, event):
+        """Ajoute sans attendre ; retourne False si le client ne suit plus"""
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.close()
+            return False
+
+    def close(self):
+        """Les événements en attente sont périmés : on les remplace par un resync"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(RESYNC)
+        self.closed = True
+
+
+class ProductChangeFeed:
+    def __init__(self):
+        self._by_product = defaultdict(set)   # product_id -> {Subscriber}
+        self._subscribers = set()
+        self._known = {}                       # product_id -> (price, stock, available)
+        self._cursor = None
+        self._task = None
+
+    @property
+    def connections(self):
+        return len(self._subscribers)
+
+    def subscribe(self, product_ids):
+        """Retourne un abonné, ou None si le processus a atteint LIVE_MAX_CONNECTIONS"""
+        if len(self._subscribers) >= settings.LIVE_MAX_CONNECTIONS:
+            return None
+        subscriber = Subscriber(product_ids)
+        self._subscribers.add(subscriber)
+        for product_id in subscriber.product_ids:
+            self._by_product[product_id].add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        if subscriber not in self._subscribers:
+            return
+        self._subscribers.discard(subscriber)
+        for product_id in subscriber.product_ids:
+            watchers = self._by_product.get(product_id)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers:
+                    del self._by_product[product_id]
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()  # plus personne à servir : le poller s'arrête
+            self._task = None
+
+    async def _run(self):
+        try:
+            await self._poll_forever()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Flux temps réel : poller interrompu, abonnés renvoyés au resync")
+            self._close_all()
+
+    def _close_all(self):
+        subscribers = list(self._subscribers)
+        self._subscribers.clear()
+        self._by_product.clear()
+        self._task = None
+        for subscriber in subscribers:
+            subscriber.close()
+
+    async def _poll_forever(self):
+        latest = await Product.objects.aaggregate(latest=Max('updated_at'))
+        self._cursor = latest['latest']
+        # Valeurs de référence pour les lignes de la marge de recouvrement
+        self._known = {
+            row['id']: tuple(row[field] for field in LIVE_FIELDS) for row in await self.poll()
+        }
+        while self._subscribers:
+            await asyncio.sleep(settings.LIVE_POLL_INTERVAL)
+            self.publish(await self.poll())
+
+    async def poll(self):
+        """Une requête : les produits modifiés depuis le curseur (moins une marge de recouvrement)"""
+        products = Product.objects.order_by('updated_at')
+        if self._cursor is not None:
+            # Marge pour les transactions validées après un tick mais horodatées avant
+            since = self._cursor - timedelta(seconds=settings.LIVE_POLL_OVERLAP)
+            products = products.filter(updated_at__gt=since)
+        rows = [row async for row in products.values('id', 'slug', 'updated_at', *LIVE_FIELDS)]
+        if rows:
+            self._cursor = max(self._cursor or rows[-1]['updated_at'], rows[-1]['updated_at'])
+        return rows
+
+    def publish(self, rows):
+        """Diffuse les lignes dont prix, stock ou disponibilité ont réellement changé"""
+        for row in rows:
+            values = tuple(row[field] for field in LIVE_FIELDS)
+            if self._known.get(row['id']) == values:
+                continue  # déjà vue (recouvrement) ou modification sans effet visible
+            self._known[row['id']] = values
+            watchers = self._by_product.get(row['id'])
+            if not watchers:
+                continue
+            event = "event: product\ndata: %s\n\n" % json.dumps({
+                'id': row['id'], 'slug': row['slug'], 'price': str(row['price']),
+                'stock': row['stock'], 'available': row['available'],
+            }, separators=(',', ':'))
+            for subscriber in list(watchers):
+                if not subscriber.offer(event):
+                    self.unsubscribe(subscriber)
+
+
+product_feed = ProductChangeFeed()
+
+
+async def event_stream(subscriber):
+    try:
+        yield f"retry: {settings.LIVE_RETRY_MS}\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), settings.LIVE_KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"  # détecte aussi les connexions mortes
+                continue
+            yield event
+            if event is RESYNC:
+                return
+    finally:
+        product_feed.unsubscribe(subscriber)
+
+
+@require_GET
+async def product_stream(request):
+    """GET /live/products/?slug=a&slug=b : événements `product` pour ces produits"""
+    if not isinstance(request, ASGIRequest):
+        # Sous WSGI, une connexion ouverte bloquerait un worker entier
+        return HttpResponse("Flux disponible uniquement via ASGI.", status=501)
+
+    slugs = request.GET.getlist('slug')[:settings.LIVE_MAX_PRODUCTS]
+    product_ids = [pk async for pk in Product.objects.filter(slug__in=slugs).values_list('id', flat=True)]
+    if not product_ids:
+        raise Http404("Aucun produit à suivre.")
+
+    subscriber = product_feed.subscribe(product_ids)
+    if subscriber is None:
+        response = HttpResponse("Trop de connexions, réessayez plus tard.", status=503)
+        response['Retry-After'] = '30'
+        return response
+
+    response = StreamingHttpResponse(event_stream(subscriber), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx : pas de mise en tampon du flux
+    return response
@@ -0,0 +1,204 @@
+# store/management/commands/advise_indexes.py
+"""Conseiller d'index : capture le SQL émis pendant les tests, EXPLAIN chaque requête
+distincte sur la base configurée, signale scans complets et tris sans index, et
+propose des index composites (égalités du WHERE puis colonnes de l'ORDER BY).
+
+    python manage.py advise_indexes                 # toute la suite de tests
+    python manage.py advise_indexes store.tests     # un sous-ensemble
+
+Les propositions sont à reporter dans Meta.indexes, puis `makemigrations` :
+une migration écrite seule serait annulée (RemoveIndex) par le makemigrations suivant.
+"""
+import re
+from collections import OrderedDict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, models
+from django.test.utils import get_runner
+
+QUOTED = r'[`"](\w+)[`"]\.[`"](\w+)[`"]'
+# égalité avec une valeur (les conditions de jointure "a"."x" = "b"."y" sont exclues)
+EQUALITY_RE = re.compile(QUOTED + r'\s*(?:=(?!\s*[`"])|IN\b)')
+# filtre booléen nu : WHERE "t"."available" / AND NOT "t"."available" / WHERE (NOT ("t"."available")
+BOOLEAN_RE = re.compile(r'(?:WHERE|AND)\s+\(?(?:NOT\s+)?\(?' + QUOTED + r'(?=\s*(?:\)|AND\b|OR\b|ORDER\b|LIMIT\b|$))')
+ORDER_BY_RE = re.compile(r'\bORDER BY (.+?)(?:\bLIMIT\b|\bFOR UPDATE\b|$)', re.S)
+ORDER_COLUMN_RE = re.compile(QUOTED + r'(\s+DESC)?')
+
+
+def normalize_sql(sql):
+    return re.sub(r'IN \([%s, ]+\)', 'IN (...)', sql)
+
+
+def explain(cursor, vendor, sql, params):
+    """Retourne [(table, problème)] : 'scan complet' ou 'tri sans index'"""
+    problems = []
+    if vendor == 'sqlite':
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        for row in cursor.fetchall():
+            detail = row[-1]
+            match = re.match(r'SCAN (\w+)', detail)
+            if match and 'INDEX' not in detail:
+                problems.append((match.group(1), 'scan complet'))
+            elif 'TEMP B-TREE FOR ORDER BY' in detail:
+                problems.append((None, 'tri sans index'))
+    elif vendor == 'mysql':
+        cursor.execute('EXPLAIN ' + sql, params)
+        columns = [c[0] for c in cursor.description]
+        for row in cursor.fetchall():
+            row = dict(zip(columns, row))
+            if row.get('type') == 'ALL':
+                problems.append((row['table'], 'scan complet'))
+            if 'Using filesort' in (row.get('Extra') or ''):
+                problems.append((row['table'], 'tri sans index'))
+    elif vendor == 'postgresql':
+        cursor.execute('EXPLAIN ' + sql, params)
+        for (line,) in cursor.fetchall():
+            match = re.search(r'Seq Scan on (\w+)', line)
+            if match:
+                problems.append((match.group(1), 'scan complet'))
+            elif re.match(r'\s*(->\s*)?Sort\b', line):
+                problems.append((None, 'tri sans index'))
+    return problems
+
+
+class SqlCapture:
+    """execute_wrapper : EXPLAIN de chaque SELECT distinct juste après son exécution,
+    donc sur les données présentes à ce moment-là (les tests sont rejoués en transaction)."""
+
+    def __init__(self):
+        self.plans = OrderedDict()   # sql normalisé -> (sql, problèmes)
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        key = normalize_sql(sql)
+        if self._explaining or many or key in self.plans or not sql.lstrip().upper().startswith('SELECT'):
+            return result
+        db = context['connection']
+        # Les EXPLAIN ne doivent pas être vus par les autres wrappers (compteurs des tests)
+        wrappers, db.execute_wrappers = db.execute_wrappers, []
+        self._explaining = True
+        try:
+            with db.cursor() as cursor:
+                self.plans[key] = (sql, explain(cursor, db.vendor, sql, params))
+        except Exception as exc:  # requête non explicable (ex. curseur serveur)
+            self.plans[key] = (sql, [(None, f"EXPLAIN impossible : {exc}")])
+        finally:
+            self._explaining = False
+            db.execute_wrappers = wrappers
+        return result
+
+
+def models_by_table():
+    return {
+        model._meta.db_table: model
+        for model in apps.get_models()
+        if model._meta.app_config.path.startswith(str(settings.BASE_DIR))
+    }
+
+
+def existing_prefixes(model):
+    """Préfixes de colonnes déjà couverts par un index (Meta, unicité, clés étrangères)"""
+    covered = set()
+    for index in model._meta.indexes:
+        covered.add(tuple(f.lstrip('-') for f in index.fields))
+    for constraint in model._meta.constraints:
+        if getattr(constraint, 'fields', None):
+            covered.add(tuple(constraint.fields))
+    for fields in model._meta.unique_together:
+        covered.add(tuple(fields))
+    for field in model._meta.fields:
+        if field.db_index or field.unique or field.primary_key:
+            covered.add((field.name,))
+    return covered
+
+
+def propose_index(model, sql):
+    """Index composite : colonnes en égalité de la table puis colonnes de tri"""
+    table = model._meta.db_table
+    columns = {f.column: f for f in model._meta.fields}
+
+    fields = []
+    for tbl, col in EQUALITY_RE.findall(sql) + BOOLEAN_RE.findall(sql):
+        if tbl == table and col in columns and not columns[col].primary_key:
+            name = columns[col].name
+            if name not in fields:
+                fields.append(name)
+
+    order = ORDER_BY_RE.search(sql)
+    if order:
+        for tbl, col, desc in ORDER_COLUMN_RE.findall(order.group(1)):
+            if tbl != table or col not in columns:
+                break  # tri sur une autre table : aucun index de cette table ne l'évite
+            if columns[col].primary_key:
+                continue  # départage par la clé primaire : déjà implicite dans l'index
+            name = columns[col].name
+            if name not in fields:
+                fields.append(('-' if desc else '') + name)
+
+    if not fields:
+        return None
+    plain = tuple(f.lstrip('-') for f in fields)
+    if any(prefix[:len(plain)] == plain for prefix in existing_prefixes(model)):
+        return None
+    return fields
+
+
+class Command(BaseCommand):
+    help = "Rejoue les tests, EXPLAIN chaque requête distincte et propose des index composites"
+
+    def add_arguments(self, parser):
+        parser.add_argument('test_labels', nargs='*', help="Tests à rejouer (défaut : toute la suite)")
+
+    def handle(self, *args, **options):
+        capture = SqlCapture()
+        runner = get_runner(settings)(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        suite = runner.build_suite(options['test_labels'])
+        old_config = runner.setup_databases(aliases=runner.get_databases(suite))
+        try:
+            with connection.execute_wrapper(capture):
+                runner.run_suite(suite)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        tables = models_by_table()
+        proposals = []   # [(modèle, champs)]
+        flagged = 0
+        for sql, problems in capture.plans.values():
+            problems = [(t, p) for t, p in problems if t is None or t in tables]
+            if not problems:
+                continue
+            flagged += 1
+            self.stdout.write(self.style.WARNING(
+                ", ".join(f"{p} ({t})" if t else p for t, p in problems)
+            ))
+            self.stdout.write(f"    {sql[:300]}")
+            # un tri signalé sans table précise concerne les tables de la requête
+            involved = {t for t, _ in problems if t} or {t for t in tables if re.search(rf'[`"]{t}[`"]', sql)}
+            for table in involved:
+                fields = propose_index(tables[table], sql)
+                if fields and (tables[table], tuple(fields)) not in proposals:
+                    proposals.append((tables[table], tuple(fields)))
+
+        # un index qui est le préfixe d'un autre index proposé est redondant
+        proposals = [
+            (model, fields) for model, fields in proposals
+            if not any(m is model and len(f) > len(fields) and f[:len(fields)] == fields for m, f in proposals)
+        ]
+
+        self.stdout.write(f"\n{len(capture.plans)} requêtes distinctes, {flagged} signalées.")
+        if not proposals:
+            self.stdout.write(self.style.SUCCESS("Aucun index à proposer."))
+            return
+
+        for model, fields in proposals:
+            index = models.Index(fields=list(fields))
+            index.set_name_with_model(model)
+            self.stdout.write(self.style.SUCCESS(
+                f"{model.__name__}.Meta.indexes += models.Index(fields={list(fields)!r}, name={index.name!r})"
+            ))
+        self.stdout.write("Reportez ces index dans Meta.indexes puis lancez makemigrations.")
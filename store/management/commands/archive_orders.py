@@ -0,0 +1,19 @@
+# store/management/commands/archive_orders.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.archive import archive_orders
+
+
+class Command(BaseCommand):
+    help = "Déplace les commandes livrées/annulées anciennes vers les tables d'archive, par lots"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ORDER_ARCHIVE_AFTER_DAYS,
+                            help="Âge minimal (jours depuis la dernière mise à jour)")
+        parser.add_argument('--batch-size', type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE,
+                            help="Commandes déplacées par transaction")
+
+    def handle(self, *args, **options):
+        archived = archive_orders(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"{archived} commande(s) archivée(s)."))
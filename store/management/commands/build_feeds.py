@@ -0,0 +1,19 @@
+# store/management/commands/build_feeds.py
+from django.core.management.base import BaseCommand
+
+from store.feeds import build_feeds
+
+
+class Command(BaseCommand):
+    help = "Construit sitemap.xml (index + shards) et le flux produits en gzip ; seuls les shards modifiés sont régénérés"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help="URL publique du site (défaut : SITE_URL)")
+        parser.add_argument('--force', action='store_true', help="Régénère tous les shards")
+
+    def handle(self, *args, **options):
+        changed = build_feeds(base_url=options['base_url'], force=options['force'])
+        if changed:
+            self.stdout.write(self.style.SUCCESS(f"Shards régénérés : {', '.join(map(str, changed))}"))
+        else:
+            self.stdout.write("Aucun shard modifié.")
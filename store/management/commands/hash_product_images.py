@@ -0,0 +1,33 @@
+# store/management/commands/hash_product_images.py
+from django.core.management.base import BaseCommand
+
+from store.models import Product
+from store.storage import is_hashed_name
+
+
+class Command(BaseCommand):
+    help = "Renomme les images produit existantes selon leur contenu (SHA-256), avec dédoublonnage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-originals', action='store_true',
+                            help="Supprime les anciens fichiers une fois renommés")
+
+    def handle(self, *args, **options):
+        renamed = 0
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        for product in products.iterator():
+            old_name = product.image.name
+            if is_hashed_name(old_name):
+                continue
+            storage = product.image.storage
+            if not storage.exists(old_name):
+                self.stderr.write(f"Fichier manquant : {old_name} ({product.slug})")
+                continue
+            with storage.open(old_name, 'rb') as fh:
+                product.image.name = storage.save(old_name, fh)
+            product.save(update_fields=['image'])
+            if options['delete_originals'] and not Product.objects.filter(image=old_name).exists():
+                storage.delete(old_name)
+            renamed += 1
+            self.stdout.write(f"{old_name} -> {product.image.name}")
+        self.stdout.write(self.style.SUCCESS(f"{renamed} image(s) renommée(s)."))
@@ -0,0 +1,31 @@
+# store/management/commands/update_prices.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from store.pricing import BulkUpdateReport, apply_updates, read_price_file
+
+
+class Command(BaseCommand):
+    help = "Met à jour prix, stock et disponibilité depuis un fichier CSV (slug;price;stock;available)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier CSV, séparateur « , » ou « ; »")
+        parser.add_argument('--batch-size', type=int, default=settings.BULK_UPDATE_BATCH_SIZE,
+                            help="Produits par transaction")
+        parser.add_argument('--dry-run', action='store_true', help="Calcule les changements sans écrire")
+
+    def handle(self, *args, **options):
+        report = BulkUpdateReport()
+        with open(options['path'], encoding='utf-8-sig', newline='') as fh:
+            updates = read_price_file(fh, report)
+        apply_updates(updates, options['batch_size'], options['dry_run'], report)
+
+        for error in report.errors:
+            self.stderr.write(f"Rejetée : {error}")
+        if report.unknown:
+            self.stderr.write(f"{len(report.unknown)} slug(s) inconnu(s) : {', '.join(report.unknown[:20])}")
+        verb = "à modifier" if options['dry_run'] else "modifié(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"{report.received} ligne(s) lue(s), {report.changed} produit(s) {verb}, "
+            f"{report.unchanged} inchangé(s), {report.batches} lot(s)."
+        ))
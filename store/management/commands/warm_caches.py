@@ -0,0 +1,41 @@
+# store/management/commands/warm_caches.py
+import urllib.error
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from store.checks import is_process_local
+from store.warmup import warm_site
+
+
+class Command(BaseCommand):
+    help = (
+        "Préchauffe le cache de pages partagé par des requêtes HTTP vers le site en service "
+        "(pages catalogue et produits les plus vendus)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default=settings.SITE_URL,
+                            help="Adresse du site à préchauffer (défaut : SITE_URL)")
+
+    def handle(self, *args, **options):
+        if is_process_local(settings.PAGE_CACHE_ALIAS):
+            self.stderr.write(self.style.WARNING(
+                f"Le cache '{settings.PAGE_CACHE_ALIAS}' est propre à chaque processus : "
+                "seul le worker qui répond sera préchauffé (voir store.E001)."
+            ))
+        try:
+            report = warm_site(options['url'])
+        except urllib.error.URLError as exc:
+            raise CommandError(f"{options['url']} injoignable : {exc.reason}")
+
+        total = 0
+        for label, items, failures, seconds in report:
+            total += seconds
+            self.stdout.write(f"{label:<16} {len(items):>5} élément(s)  {seconds * 1000:8.1f} ms")
+            if options['verbosity'] > 1:
+                for item in items:
+                    self.stdout.write(f"    {item}")
+            for failure in failures:
+                self.stderr.write(f"    échec : {failure}")
+        self.stdout.write(self.style.SUCCESS(f"Préchauffage terminé en {total:.2f} s."))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:07
+
+import store.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_cart_updated_at_cartitem_created_at_alter_cart_user_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=store.storage.product_image_storage, upload_to='products/'),
+        ),
+    ]
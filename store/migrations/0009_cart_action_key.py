@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_product_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartActionKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64)),
+                ('key', models.CharField(max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='action_keys', to='store.cart')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('cart', 'scope', 'key'), name='unique_cart_action_key')],
+            },
+        ),
+    ]
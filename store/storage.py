@@ -0,0 +1,67 @@
+# store/storage.py
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.[\w]+$')
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Stockage adressé par contenu : products/ab/ab12…ef.jpg
+
+    Le nom dérive du SHA-256 du fichier : deux envois identiques partagent le même
+    fichier et une URL ne change jamais de contenu (cache navigateur « immutable »).
+    """
+
+    def hashed_name(self, name, content):
+        sha = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha.update(chunk)
+        content.seek(0)
+        digest = sha.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name  # déjà stocké : dédoublonnage
+        return super().save(name, content, max_length=max_length)
+
+    def get_available_name(self, name, max_length=None):
+        # Même nom = même contenu : jamais de suffixe aléatoire
+        return name
+
+    def _save(self, name, content):
+        # Écriture dans un fichier temporaire puis rename : deux envois simultanés
+        # du même fichier écrivent le même contenu, le dernier rename gagne sans risque
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as fh:
+                for chunk in content.chunks():
+                    fh.write(chunk)
+            os.chmod(tmp_path, self.file_permissions_mode or 0o644)
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        return name.replace('\\', '/')
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME_RE.search(name))
+
+
+def product_image_storage():
+    return ContentHashStorage()
@@ -0,0 +1,24 @@
+# store/templatetags/page_cache.py
+import uuid
+
+from django import template
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from store.page_cache import hole_marker
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, template_name):
+    """Fragment personnalisé : laissé en trou dans une page mise en cache, rendu sinon"""
+    request = context.get('request')
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(hole_marker(template_name))
+    return render_to_string(template_name, context.flatten(), request=request)
+
+
+@register.simple_tag
+def new_idempotency_key():
+    return uuid.uuid4().hex
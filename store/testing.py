@@ -0,0 +1,155 @@
+# store/testing.py
+"""Outils de test partagés par les applications du projet.
+
+- `StoreTestCase` : catégorie, produit et client de base, et fabriques de données ;
+- `QueryBudgetTestCase` : vérifie qu'une vue émet le même nombre de requêtes
+  quel que soit le volume de données.
+"""
+import itertools
+import re
+import traceback
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase
+
+from .models import Category, Product, CartItem, Order, OrderItem
+from .search import prefix_index
+
+User = get_user_model()
+
+SMALL, LARGE = 5, 500
+_counter = itertools.count()
+
+
+def unique_number():
+    return next(_counter)
+
+
+class StoreTestCase(TestCase):
+    """Données de base et fabriques en masse (bulk_create)"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Robes", slug="robes")
+        self.product = Product.objects.create(
+            name="Robe Été", slug="robe-ete", category=self.category,
+            description="Robe", price=Decimal('250.00'), stock=50,
+        )
+        self.user = User.objects.create_user("client", "client@example.com", "motdepasse-123")
+
+    def make_products(self, n, category=None):
+        category = category or self.category
+        products = [
+            Product(
+                name=f"Produit {i}", slug=f"produit-{i}", category=category,
+                description="Description", price=Decimal('19.90'), stock=10,
+                image=f"products/{i}.jpg" if i % 2 else None,
+            )
+            for i in (unique_number() for _ in range(n))
+        ]
+        return Product.objects.bulk_create(products)
+
+    def make_categories(self, n):
+        Category.objects.bulk_create(
+            Category(name=f"Catégorie {i}", slug=f"categorie-{i}")
+            for i in (unique_number() for _ in range(n))
+        )
+
+    def fill_cart(self, cart, n):
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=2) for product in self.make_products(n)
+        )
+
+    def make_orders(self, user, n, lines=2):
+        orders = Order.objects.bulk_create(
+            Order(
+                user=user, first_name="A", last_name="B", email="a@b.ma", address="Rue",
+                postal_code="20000", city="Casablanca", phone="0600000000", total=Decimal('39.80'),
+            )
+            for _ in range(n)
+        )
+        products = self.make_products(lines)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price=product.price, quantity=1)
+            for order in orders for product in products
+        )
+        return orders
+
+
+class QueryRecorder:
+    """execute_wrapper qui garde chaque requête SQL et la ligne du projet qui l'a émise"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, self.origin()))
+        return execute(sql, params, many, context)
+
+    @staticmethod
+    def origin():
+        base = str(settings.BASE_DIR)
+        for frame in reversed(traceback.extract_stack()[:-2]):
+            if frame.filename.startswith(base) and 'site-packages' not in frame.filename \
+                    and not frame.filename.endswith(('tests.py', 'testing.py')):
+                return f"{frame.filename[len(base) + 1:]}:{frame.lineno} in {frame.name}"
+        return "?"
+
+
+def normalize_sql(sql):
+    """Regroupe les requêtes qui ne diffèrent que par leurs valeurs"""
+    sql = re.sub(r"'[^']*'|\b\d+\b", '?', sql)
+    sql = re.sub(r"VALUES \(.*\)", 'VALUES (...)', sql)
+    return re.sub(r"IN \([%s?, ]+\)", 'IN (...)', sql)
+
+
+class QueryBudgetTestCase(StoreTestCase):
+    """`seed(n)` ajoute n lignes de données ; la vue est appelée après SMALL puis LARGE
+    lignes, et un écart fait échouer le test avec le SQL en trop et son origine.
+    """
+
+    def reset_caches(self):
+        # Mesure à froid : ni page en cache ni index d'autocomplétion déjà construit
+        for cache in caches.all():
+            cache.clear()
+        prefix_index.clear()
+
+    def measure(self, call, prepare):
+        prepare()
+        call()  # échauffement : créations paresseuses (invité, panier, session...)
+        prepare()
+        self.reset_caches()
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = call()
+            if getattr(response, 'streaming', False):
+                b''.join(response.streaming_content)
+        self.assertLess(response.status_code, 400, response)
+        return recorder.queries
+
+    def assertQueryBudgetStable(self, seed, call, sizes=(SMALL, LARGE), prepare=lambda: None):
+        """`prepare` est appelé avant chaque appel, hors mesure (ex. remplir un panier vidé)"""
+        runs = []
+        seeded = 0
+        for size in sizes:
+            seed(size - seeded)
+            seeded = size
+            runs.append(self.measure(call, prepare))
+
+        small, large = runs[0], runs[-1]
+        if len(small) == len(large):
+            return
+
+        small_counts = Counter(normalize_sql(sql) for sql, _ in small)
+        large_counts = Counter(normalize_sql(sql) for sql, _ in large)
+        origins = {normalize_sql(sql): origin for sql, origin in large}
+        lines = [
+            f"{len(small)} requêtes pour {sizes[0]} lignes, {len(large)} pour {sizes[-1]} :"
+        ]
+        for sql, count in (large_counts - small_counts).most_common():
+            lines.append(f"  +{count} x {sql}\n      depuis {origins[sql]}")
+        self.fail("\n".join(lines))
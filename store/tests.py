@@ -1,3 +1,1072 @@
-from django.test import TestCase
+import asyncio
+import gc
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBSessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import LiveServerTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .archive import archive_orders
+from .management.commands.advise_indexes import (
+    EQUALITY_RE, ORDER_BY_RE, ORDER_COLUMN_RE, propose_index,
+)
+from .models import Category, Product, Cart, CartActionKey, CartItem, Order, OrderItem, ArchivedOrder
+from . import checks, feeds, live, warmup
+from .search import PrefixIndex, prefix_index
+from .sessions import SessionStore, local_sessions
+from .page_cache import VERSION_KEY, page_cache, page_cache_key
+from .pricing import apply_updates
+from .storage import is_hashed_name, product_image_storage
+from .testing import SMALL, QueryBudgetTestCase, StoreTestCase, unique_number
+
+User = get_user_model()
+
+
+@override_settings(FEEDS_ROOT=tempfile.mkdtemp())
+class StoreQueryBudgetTests(QueryBudgetTestCase):
+
+    def login(self):
+        self.client.force_login(self.user)
+
+    def user_cart(self):
+        self.login()
+        return Cart.objects.create(user=self.user)
+
+    # Catalogue
+
+    def test_home(self):
+        self.assertQueryBudgetStable(
+            lambda n: (self.make_products(n), self.make_categories(n)),
+            lambda: self.client.get(reverse('store:home')),
+        )
+
+    def test_product_list(self):
+        self.assertQueryBudgetStable(
+            lambda n: (self.make_products(n), self.make_categories(n)),
+            lambda: self.client.get(reverse('store:product_list')),
+        )
+
+    def test_product_list_filtered(self):
+        self.assertQueryBudgetStable(
+            self.make_products,
+            lambda: self.client.get(reverse('store:product_list'), {'category': 'robes', 'q': 'Produit'}),
+        )
+
+    def test_product_detail(self):
+        self.assertQueryBudgetStable(
+            self.make_products,
+            lambda: self.client.get(reverse('store:product_detail', args=['robe-ete'])),
+        )
+
+    def test_sitemap(self):
+        self.assertQueryBudgetStable(self.make_products, lambda: self.client.get(reverse('store:sitemap')))
+
+    def test_sitemap_shard(self):
+        self.assertQueryBudgetStable(
+            self.make_products,
+            lambda: self.client.get(reverse('store:sitemap_shard', args=[0])),
+        )
+
+    def test_product_feed(self):
+        self.assertQueryBudgetStable(self.make_products, lambda: self.client.get(reverse('store:product_feed')))
+
+    def test_api_product_list(self):
+        self.assertQueryBudgetStable(
+            self.make_products,
+            lambda: self.client.get(reverse('store:api_product_list'), {'fields': 'id,name,category,image,url'}),
+        )
+
+    def test_api_product_detail(self):
+        self.assertQueryBudgetStable(
+            self.make_products,
+            lambda: self.client.get(reverse('store:api_product_detail', args=['robe-ete'])),
+        )
+
+    def test_api_autocomplete(self):
+        self.assertQueryBudgetStable(
+            lambda n: (self.make_products(n), self.make_orders(self.user, n)),
+            lambda: self.client.get(reverse('store:api_autocomplete'), {'q': 'pro'}),
+        )
+
+    # Panier
+
+    def test_cart_detail(self):
+        cart = self.user_cart()
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.get(reverse('store:cart_detail')),
+        )
+
+    def test_cart_detail_guest(self):
+        self.client.post(reverse('store:add_to_cart', args=['robe-ete']), {'quantity': 1})
+        cart = Cart.objects.get(session_key=self.client.session.session_key)
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.get(reverse('store:cart_detail')),
+        )
+
+    def test_add_to_cart(self):
+        cart = self.user_cart()
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.post(reverse('store:add_to_cart', args=['robe-ete']), {'quantity': 2}),
+        )
+
+    def test_update_cart(self):
+        cart = self.user_cart()
+        item = CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.post(reverse('store:update_cart', args=[item.id]), {'action': 'increase'}),
+        )
+
+    def test_remove_from_cart(self):
+        cart = self.user_cart()
+        item = CartItem(cart=cart, product=self.product)
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.get(reverse('store:remove_from_cart', args=[item.id])),
+            prepare=item.save,
+        )
+
+    def test_api_cart(self):
+        cart = self.user_cart()
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.get(reverse('store:api_cart')),
+        )
+
+    def test_api_cart_batch(self):
+        cart = self.user_cart()
+        ops = '{"ops": [{"op": "add", "product": "robe-ete", "quantity": 1}]}'
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.post(reverse('store:api_cart'), ops, content_type='application/json'),
+        )
+
+    # Commandes
+
+    def test_checkout(self):
+        cart = self.user_cart()
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.get(reverse('store:checkout')),
+        )
+
+    def test_checkout_submit(self):
+        cart = self.user_cart()
+        form = {
+            'first_name': 'Amal', 'last_name': 'B', 'email': 'amal@example.com', 'phone': '0600000000',
+            'address': 'Rue 1', 'postal_code': '20000', 'city': 'Casablanca',
+        }
+        lines = []
+
+        def seed(n):
+            lines.extend(self.make_products(n))
+
+        def refill():
+            # le panier est vidé à chaque commande : on le remplit à la taille courante
+            CartItem.objects.bulk_create(CartItem(cart=cart, product=p) for p in lines)
+
+        # 200 lignes : au-delà, SQLite découpe le bulk_create en plusieurs INSERT (999 paramètres)
+        self.assertQueryBudgetStable(
+            seed, lambda: self.client.post(reverse('store:checkout'), form), sizes=(SMALL, 200), prepare=refill,
+        )
+
+    def test_order_success(self):
+        self.login()
+        order = self.make_orders(self.user, 1)[0]
+        self.assertQueryBudgetStable(
+            lambda n: OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=p, price=p.price) for p in self.make_products(n)
+            ),
+            lambda: self.client.get(reverse('store:order_success', args=[order.id])),
+        )
+
+    @override_settings(ORDERS_PER_PAGE=2)
+    def test_order_history(self):
+        self.login()
+        self.assertQueryBudgetStable(
+            lambda n: self.make_orders(self.user, n),
+            lambda: self.client.get(reverse('store:order_history')),
+        )
+
+    @override_settings(ORDERS_PER_PAGE=2)
+    def test_order_history_archive_page(self):
+        self.login()
+
+        def seed(n):
+            self.make_orders(self.user, n)
+            Order.objects.update(status='delivered', updated_at=timezone.now() - timedelta(days=365))
+            archive_orders()
+
+        self.assertQueryBudgetStable(
+            seed, lambda: self.client.get(reverse('store:order_history'), {'page': 2}),
+        )
+
+
+class PageCacheTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        page_cache().clear()
+
+    def test_holes_are_filled_per_request(self):
+        url = reverse('store:product_detail', args=['robe-ete'])
+        first = self.client.get(url).content.decode()
+        self.assertEqual(len(page_cache()._cache), 1)
+        self.assertIn(b'<!--hole:', next(iter(page_cache()._cache.values())))
+
+        other = self.client_class().get(url).content.decode()
+        self.assertNotIn('<!--hole:', other)
+        self.assertIn('Connexion', other)
+        token = 'name="csrfmiddlewaretoken" value="'
+        self.assertNotEqual(first.split(token)[1][:32], other.split(token)[1][:32])
+
+    def test_authenticated_users_bypass_the_cache(self):
+        self.client.force_login(self.user)
+        content = self.client.get(reverse('store:product_list')).content.decode()
+        self.assertIn('Commandes', content)
+        self.assertEqual(len(page_cache()._cache), 0)
+
+    def test_key_varies_with_query_string_and_language(self):
+        factory = RequestFactory()
+
+        def key(query, language='fr'):
+            request = factory.get('/store/products/', query)
+            request.LANGUAGE_CODE = language
+            return page_cache_key(request)
+
+        self.assertEqual(key({'a': 1, 'b': 2}), key({'b': 2, 'a': 1}))
+        self.assertNotEqual(key({'category': 'robes'}), key({'category': 'jupes'}))
+        self.assertNotEqual(key({}), key({}, 'en'))
+
+    def test_product_save_invalidates_pages_for_every_process(self):
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with self.settings(CACHES={**settings.CACHES, 'pages': shared}):
+                url = reverse('store:product_detail', args=['robe-ete'])
+                self.assertContains(self.client.get(url), '250,00')
+                # Une autre instance du même cache, comme dans un autre worker
+                other_worker = FileBasedCache(location, {})
+                version = other_worker.get(VERSION_KEY, 0)
+
+                self.product.price = Decimal('199.00')
+                self.product.save()
+                self.assertEqual(other_worker.get(VERSION_KEY), version + 1)
+                self.assertContains(self.client.get(url), '199,00')
+
+
+class CartTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.user)
+        self.cart = Cart.objects.create(user=self.user)
+
+    def add(self, **data):
+        return self.client.post(reverse('store:add_to_cart', args=['robe-ete']), data)
+
+    def update(self, item_id, action, key='cle-1'):
+        return self.client.post(
+            reverse('store:update_cart', args=[item_id]), {'action': action, 'idempotency_key': key},
+        )
+
+    def test_quantity_is_honored(self):
+        self.add(quantity=3)
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 3)
+
+    def test_invalid_quantity_is_rejected(self):
+        for quantity in ('zzz', 0):
+            response = self.add(quantity=quantity)
+            self.assertRedirects(response, self.product.get_absolute_url(), fetch_redirect_response=False)
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_double_submit_adds_once(self):
+        self.add(quantity=2, idempotency_key='cle-1')
+        self.add(quantity=2, idempotency_key='cle-1')
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 2)
+        self.add(quantity=2, idempotency_key='cle-2')
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 4)
+
+    def test_double_submit_updates_once(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+        self.update(item.id, 'increase')
+        self.update(item.id, 'increase')
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 2)
+
+    def test_decrease_to_zero_removes_the_item(self):
+        item = CartItem.objects.create(cart=self.cart, product=self.product, quantity=1)
+        self.update(item.id, 'decrease')
+        self.assertFalse(CartItem.objects.filter(id=item.id).exists())
+
+    def test_unknown_item_releases_the_key(self):
+        self.assertEqual(self.update(9999, 'increase').status_code, 404)
+        self.assertFalse(CartActionKey.objects.exists())
+
+    @override_settings(CART_IDEMPOTENCY_TIMEOUT=60)
+    def test_expired_keys_are_forgotten(self):
+        self.add(quantity=1, idempotency_key='cle-1')
+        CartActionKey.objects.update(created_at=timezone.now() - timedelta(minutes=2))
+        self.add(quantity=1, idempotency_key='cle-1')
+        self.assertEqual(CartItem.objects.get(cart=self.cart).quantity, 2)
+        self.assertEqual(CartActionKey.objects.count(), 1)
+
+
+class ApiCartTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_class(enforce_csrf_checks=True)
+        self.client.force_login(self.user)
+        self.url = reverse('store:api_cart')
+
+    def post(self, *ops, **headers):
+        return self.client.post(
+            self.url, json.dumps({'ops': list(ops)}), content_type='application/json', headers=headers,
+        )
+
+    def csrf_token(self):
+        self.client.get(self.url)
+        return self.client.cookies['csrftoken'].value
+
+    def test_get_sets_the_csrf_cookie_required_by_post(self):
+        add = {'op': 'add', 'product': 'robe-ete', 'quantity': 2}
+        self.assertEqual(self.post(add).status_code, 403)
+        response = self.post(add, **{'X-CSRFToken': self.csrf_token()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 2)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('store:api_product_list'), {'fields': 'id,prix'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('prix', response.json()['error'])
+
+    def test_limits_are_validated(self):
+        for url in (reverse('store:api_product_list'), reverse('store:api_autocomplete')):
+            for limit in ('-5', '0', '101', 'abc'):
+                response = self.client.get(url, {'limit': limit, 'q': 'robe'})
+                self.assertEqual(response.status_code, 400, (url, limit))
+                self.assertIn('limit', response.json()['error'])
+        response = self.client.get(reverse('store:api_product_list'), {'offset': '-1'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('store:api_product_list'), {'limit': '1'})
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_bad_operation_rolls_back_the_batch(self):
+        response = self.post(
+            {'op': 'add', 'product': 'robe-ete', 'quantity': 2},
+            {'op': 'update', 'item': 9999, 'delta': 1},
+            **{'X-CSRFToken': self.csrf_token()},
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertIn('Opération 1', response.json()['error'])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_idempotency_key_replay_applies_once(self):
+        headers = {'X-CSRFToken': self.csrf_token(), 'Idempotency-Key': 'lot-1'}
+        add = {'op': 'add', 'product': 'robe-ete', 'quantity': 2}
+        first = self.post(add, **headers).json()
+        replay = self.post(add, **headers).json()
+        self.assertEqual(first['count'], 2)
+        self.assertEqual(replay, first)
+
+
+class SessionTests(StoreTestCase):
+
+    def guest_session(self, **data):
+        store = SessionStore()
+        store.update(data)
+        store.save()
+        return store
+
+    def other_worker_writes(self, session_key, **data):
+        """Écriture par un autre processus : niveau partagé seulement"""
+        other = CachedDBSessionStore(session_key)
+        other.update(data)
+        other.save()
+
+    def stored(self, session_key):
+        return Session.objects.get(session_key=session_key).get_decoded()
+
+    def test_unchanged_session_is_not_rewritten(self):
+        store = self.guest_session(panier=1)
+        self.other_worker_writes(store.session_key, panier=2)
+        again = SessionStore(store.session_key)
+        self.assertEqual(again['panier'], 1)  # niveau local
+        again.save()
+        self.assertEqual(self.stored(store.session_key), {'panier': 2})
+
+    def test_stale_local_read_does_not_lose_other_writes(self):
+        store = self.guest_session(a=1, b=1)
+        self.other_worker_writes(store.session_key, c=2)
+        again = SessionStore(store.session_key)
+        again['d'] = 3
+        del again['b']
+        again.save()
+        self.assertEqual(self.stored(store.session_key), {'a': 1, 'c': 2, 'd': 3})
+
+    def test_guests_get_no_session_on_read_only_pages(self):
+        for url in (reverse('store:home'), reverse('store:product_list'), reverse('store:cart_detail')):
+            self.client.get(url)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+
+    def test_logout_elsewhere_applies_immediately(self):
+        self.client.force_login(self.user)
+        session_key = self.client.session.session_key
+        self.assertIsNone(local_sessions.get(session_key))
+        self.assertEqual(self.client.get(reverse('store:order_history')).status_code, 200)
+        SessionStore(session_key).delete()  # déconnexion sur un autre worker
+        self.assertEqual(self.client.get(reverse('store:order_history')).status_code, 302)
+
+    def test_cache_eviction_does_not_log_users_out(self):
+        self.client.force_login(self.user)
+        caches[settings.SESSION_CACHE_ALIAS].clear()
+        self.assertEqual(self.client.get(reverse('store:order_history')).status_code, 200)
+
+    def test_clear_expired_purges_the_table(self):
+        old = self.guest_session(panier=1)
+        fresh = self.guest_session(panier=2)
+        Session.objects.filter(session_key=old.session_key).update(
+            expire_date=timezone.now() - timedelta(seconds=1),
+        )
+        SessionStore.clear_expired()
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)), [fresh.session_key],
+        )
+
+    def test_process_local_session_cache_is_refused(self):
+        local = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+        with self.settings(CACHES={**settings.CACHES, 'sessions': local}):
+            self.assertEqual([e.id for e in checks.check_session_cache_shared(None)], ['store.E003'])
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        with self.settings(CACHES={**settings.CACHES, 'sessions': dummy}):
+            self.assertEqual(checks.check_session_cache_shared(None), [])
+
+
+class SearchIndexTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        prefix_index.clear()
+
+    def labels(self, query, index=prefix_index):
+        return [s['label'] for s in index.suggest(query)]
+
+    def test_accents_and_case_are_folded(self):
+        for query in ('robe ete', 'ROBE ÉTÉ', 'Robe  Ete'):
+            self.assertIn("Robe Été", self.labels(query))
+
+    def test_every_word_starts_a_prefix(self):
+        self.assertEqual(self.labels('et'), ["Robe Été"])
+        self.assertEqual(self.labels('obe'), [])
+
+    def test_best_sellers_come_first(self):
+        soiree = Category.objects.create(name="Robes de soirée", slug="robes-soiree")
+        best = Product.objects.create(
+            name="Robe Zèbre", slug="robe-zebre", category=soiree,
+            description="Robe", price=Decimal('99.00'), stock=5,
+        )
+        order = self.make_orders(self.user, 1, lines=0)[0]
+        OrderItem.objects.create(order=order, product=best, price=best.price, quantity=4)
+        prefix_index.rebuild()
+        self.assertEqual(self.labels('robe')[:2], ["Robe Zèbre", "Robes de soirée"])
+
+    def test_signals_keep_the_index_current(self):
+        self.labels('robe')
+        Product.objects.create(
+            name="Robe Hiver", slug="robe-hiver", category=self.category,
+            description="Robe", price=Decimal('300.00'), stock=5,
+        )
+        self.assertIn("Robe Hiver", self.labels('hiver'))
+
+        self.product.available = False
+        self.product.save()
+        self.assertEqual(self.labels('ete'), [])
+
+        self.category.name = "Tenues"
+        self.category.save()
+        self.assertEqual(self.labels('tenu'), ["Tenues"])
+
+        Product.objects.filter(slug='robe-hiver').delete()
+        self.assertEqual(self.labels('hiver'), [])
+
+    @override_settings(SEARCH_SCAN_LIMIT=2, SEARCH_SUGGESTIONS_MAX=3)
+    def test_wide_prefixes_keep_their_ranking_current(self):
+        robes = [
+            Product.objects.create(
+                name=f"Robe {color}", slug=f"robe-{color.lower()}", category=self.category,
+                description="Robe", price=Decimal('100.00'), stock=5,
+            )
+            for color in ("Bleue", "Rouge", "Verte")
+        ]
+        prefix_index.rebuild()
+        self.assertIn('r', prefix_index._data[2])  # servi sans parcourir les clés
+        self.assertEqual(self.labels('r'), ["Robe Bleue", "Robe Rouge", "Robe Verte"])
+
+        order = self.make_orders(self.user, 1, lines=0)[0]
+        OrderItem.objects.create(order=order, product=robes[2], price=robes[2].price, quantity=2)
+        self.assertEqual(self.labels('r'), ["Robe Verte", "Robes", "Robe Bleue"])
+
+        robes[2].delete()
+        self.assertEqual(self.labels('r'), ["Robes", "Robe Bleue", "Robe Rouge"])
+        robes[0].name = "Tunique"
+        robes[0].save()
+        self.assertEqual(self.labels('r'), ["Robes", "Robe Rouge", "Robe Été"])
+        self.assertEqual(len(prefix_index.suggest('r', limit=50)), 3)
+
+    def test_stale_index_is_served_during_a_single_rebuild(self):
+        index = PrefixIndex()
+        index.rebuild()
+        index._built_at -= settings.SEARCH_INDEX_TTL + 1
+        started, release, calls = threading.Event(), threading.Event(), []
+
+        def slow_rebuild():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+
+        index.rebuild = slow_rebuild
+        self.assertEqual(self.labels('robe', index), ["Robe Été", "Robes"])
+        started.wait(5)
+        self.assertEqual(self.labels('robe', index), ["Robe Été", "Robes"])
+        release.set()
+        index._refresh.join(5)
+        self.assertEqual(len(calls), 1)
+
+
+@override_settings(SITEMAP_SHARD_SIZE=2)
+class FeedBuildTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = Path(root.name)
+        feeds_settings = self.settings(FEEDS_ROOT=self.root)
+        feeds_settings.enable()
+        self.addCleanup(feeds_settings.disable)
+        self.products = self.make_products(5)
+
+    def shard(self, product):
+        return feeds.shard_of(product.id)
+
+    def test_only_changed_shards_are_rewritten(self):
+        all_shards = sorted({self.shard(p) for p in [self.product, *self.products]})
+        self.assertEqual(feeds.build_feeds(), all_shards)
+        self.assertEqual(feeds.build_feeds(), [])
+
+        product = self.products[2]
+        product.price = Decimal('9.90')
+        product.save()
+        self.assertEqual(feeds.build_feeds(), [self.shard(product)])
+
+    def test_deactivated_or_deleted_product_rebuilds_its_shard(self):
+        feeds.build_feeds()
+        hidden, deleted = self.products[0], self.products[-1]
+        expected = sorted({self.shard(hidden), self.shard(deleted)})
+        Product.objects.filter(id=hidden.id).update(available=False)
+        deleted.delete()
+        self.assertEqual(feeds.build_feeds(), expected)
+
+        with gzip.open(self.root / feeds.shard_filename(self.shard(hidden)), 'rt') as fh:
+            self.assertNotIn(hidden.slug, fh.read())
+
+    def test_emptied_shard_is_unlinked(self):
+        feeds.build_feeds()
+        last = self.shard(self.products[-1])
+        Product.objects.filter(id__in=[p.id for p in self.products if self.shard(p) == last]).delete()
+        feeds.build_feeds()
+        self.assertFalse((self.root / feeds.shard_filename(last)).exists())
+        with gzip.open(self.root / 'sitemap.xml.gz', 'rt') as fh:
+            self.assertNotIn(feeds.shard_filename(last).removesuffix('.gz'), fh.read())
+
+    def test_prebuilt_file_honors_accept_encoding(self):
+        feeds.build_feeds()
+        url = reverse('store:sitemap')
+
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertIn(b'<sitemapindex', gzip.decompress(b''.join(compressed.streaming_content)))
+
+        plain = self.client.get(url)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn(b'<sitemapindex', b''.join(plain.streaming_content))
+
+
+class MediaTests(StoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.media_root = Path(root.name) / 'media'
+        media_settings = self.settings(MEDIA_ROOT=self.media_root, MEDIA_SENDFILE_HEADER='')
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        self.storage = product_image_storage()
+
+    def test_identical_uploads_share_one_hashed_file(self):
+        content = b'image-bytes'
+        first = self.storage.save('products/robe.JPG', ContentFile(content))
+        second = self.storage.save('products/autre-nom.jpg', ContentFile(content))
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first, f"products/{digest[:2]}/{digest}.jpg")
+        self.assertEqual(second, first)
+        self.assertTrue(is_hashed_name(first))
+        self.assertEqual(len(list(self.media_root.rglob('*.jpg'))), 1)
+
+    @override_settings(DEBUG=True)
+    def test_hashed_names_are_cached_forever(self):
+        name = self.storage.save('products/robe.jpg', ContentFile(b'image-bytes'))
+        response = self.client.get(settings.MEDIA_URL + name)
+        self.assertEqual(b''.join(response.streaming_content), b'image-bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(f'max-age={settings.MEDIA_CACHE_MAX_AGE}', response['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE_HEADER='X-Accel-Redirect')
+    def test_front_server_sends_the_bytes(self):
+        name = self.storage.save('products/robe.jpg', ContentFile(b'image-bytes'))
+        response = self.client.get(settings.MEDIA_URL + name)
+        self.assertEqual(response['X-Accel-Redirect'], settings.MEDIA_ACCEL_PREFIX + name)
+        self.assertEqual(response.content, b'')
+
+    @override_settings(DEBUG=True)
+    def test_path_traversal_is_rejected(self):
+        (self.media_root.parent / 'secret.txt').write_text('secret')
+        self.media_root.mkdir()
+        response = self.client.get(settings.MEDIA_URL + '..%2Fsecret.txt')
+        self.assertEqual(response.status_code, 404)
+
+    def test_sendfile_header_is_required_without_debug(self):
+        self.assertEqual([e.id for e in checks.check_media_sendfile(None)], ['store.E002'])
+        name = self.storage.save('products/robe.jpg', ContentFile(b'image-bytes'))
+        with self.assertRaises(ImproperlyConfigured):
+            self.client.get(settings.MEDIA_URL + name)
+
+
+class AdviseIndexesTests(StoreTestCase):
+
+    def propose(self, queryset):
+        return propose_index(queryset.model, queryset.query.sql_with_params()[0])
+
+    def test_equalities_then_sort_columns(self):
+        self.assertEqual(
+            self.propose(Order.objects.filter(status='pending').order_by('-created_at')),
+            ['status', '-created_at'],
+        )
+
+    def test_negated_boolean_filter_and_pk_tiebreak(self):
+        queryset = Product.objects.exclude(available=True).filter(price__gt=1).order_by('-updated_at', 'id')
+        self.assertEqual(self.propose(queryset), ['available', '-updated_at'])
+
+    def test_join_conditions_and_foreign_sorts_are_ignored(self):
+        queryset = Product.objects.filter(stock__in=[1, 2]).order_by('category__name', 'name')
+        self.assertEqual(self.propose(queryset), ['stock'])
+        self.assertIsNone(self.propose(CartItem.objects.filter(cart__user=self.user)))
+
+    def test_existing_index_is_not_proposed_again(self):
+        queryset = Product.objects.filter(available=True, category=self.category).order_by('-created_at')
+        self.assertIsNone(self.propose(queryset))
+        self.assertIsNone(self.propose(Product.objects.filter(category=self.category).order_by()))
+
+    def test_order_by_stops_at_limit_and_for_update(self):
+        sql = 'SELECT 1 FROM "t" ORDER BY "t"."a" DESC, "t"."b" LIMIT 5'
+        self.assertEqual(ORDER_COLUMN_RE.findall(ORDER_BY_RE.search(sql).group(1)), [
+            ('t', 'a', ' DESC'), ('t', 'b', ''),
+        ])
+        sql = 'SELECT 1 FROM "t" WHERE "t"."c" IN (%s, %s) ORDER BY "t"."a" FOR UPDATE'
+        self.assertEqual(ORDER_BY_RE.search(sql).group(1).strip(), '"t"."a"')
+        self.assertEqual(EQUALITY_RE.findall(sql), [('t', 'c')])
+
+
+class CheckoutTests(StoreTestCase):
+
+    def test_checkout_counts_sales_in_autocomplete(self):
+        Product.objects.create(
+            name="Robe Hiver", slug="robe-hiver", category=self.category,
+            description="Robe", price=Decimal('300.00'), stock=5,
+        )
+        prefix_index.rebuild()
+        self.assertEqual(prefix_index.suggest('robe')[0]['label'], "Robe Hiver")  # ordre alphabétique
+
+        self.client.force_login(self.user)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=3)
+        self.client.post(reverse('store:checkout'), {
+            'first_name': 'Amal', 'last_name': 'B', 'email': 'amal@example.com', 'phone': '0600000000',
+            'address': 'Rue 1', 'postal_code': '20000', 'city': 'Casablanca',
+        })
+        self.assertEqual(OrderItem.objects.get(product=self.product).quantity, 3)
+        self.assertEqual(prefix_index.suggest('robe')[0]['label'], "Robe Été")  # 3 ventes
+
+
+@override_settings(ORDERS_PER_PAGE=3, ORDER_ARCHIVE_BATCH_SIZE=2)
+class OrderArchiveTests(StoreTestCase):
+
+    def test_archive_moves_only_old_finished_orders(self):
+        orders = self.make_orders(self.user, 6)
+        old = timezone.now() - timedelta(days=365)
+        Order.objects.filter(id__in=[o.id for o in orders[:3]]).update(status='delivered', updated_at=old)
+        Order.objects.filter(id=orders[3].id).update(status='shipped', updated_at=old)
+        Order.objects.filter(id=orders[4].id).update(status='cancelled')
+
+        self.assertEqual(archive_orders(), 3)
+        self.assertEqual(Order.objects.count(), 3)
+        self.assertEqual(
+            sorted(ArchivedOrder.objects.values_list('id', flat=True)), [o.id for o in orders[:3]]
+        )
+        archived = ArchivedOrder.objects.get(id=orders[0].id)
+        self.assertEqual(archived.items.count(), 2)
+        self.assertEqual(archived.total, Decimal('39.80'))
+        self.assertEqual(archive_orders(), 0)
+
+    def test_history_pages_through_hot_then_archived(self):
+        orders = self.make_orders(self.user, 7)
+        for i, order in enumerate(orders):
+            Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=400 - i))
+        Order.objects.filter(id__in=[o.id for o in orders[:4]]).update(
+            status='delivered', updated_at=timezone.now() - timedelta(days=365),
+        )
+        archive_orders()
+        self.client.force_login(self.user)
+
+        seen = []
+        page = 1
+        while page:
+            response = self.client.get(reverse('store:order_history'), {'page': page})
+            seen.extend(order.id for order in response.context['orders'])
+            page = response.context['next_page']
+        self.assertEqual(seen, [o.id for o in reversed(orders)])
+
+    def test_history_interleaves_old_active_orders_by_date(self):
+        pending, delivered = self.make_orders(self.user, 2)
+        Order.objects.filter(id=pending.id).update(created_at=timezone.now() - timedelta(days=700))
+        Order.objects.filter(id=delivered.id).update(
+            status='delivered', created_at=timezone.now() - timedelta(days=400),
+            updated_at=timezone.now() - timedelta(days=365),
+        )
+        recent = self.make_orders(self.user, 1)[0]
+        archive_orders()
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('store:order_history'))
+        orders = response.context['orders']
+        self.assertEqual([o.id for o in orders], [recent.id, delivered.id, pending.id])
+        self.assertIsInstance(orders[1], ArchivedOrder)
+        self.assertIsNone(response.context['next_page'])
+
+    def archive_one(self):
+        order = self.make_orders(self.user, 1)[0]
+        Order.objects.filter(id=order.id).update(status='delivered', updated_at=timezone.now() - timedelta(days=365))
+        archive_orders()
+        return order
+
+    def test_archived_order_links_stay_valid(self):
+        order = self.archive_one()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('store:order_success', args=[order.id]))
+        self.assertEqual(response.context['order'], ArchivedOrder.objects.get(id=order.id))
+
+        other = User.objects.create_user("autre", "autre@example.com", "motdepasse-123")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('store:order_success', args=[order.id])).status_code, 404)
+
+    def test_admin_redirects_archived_orders(self):
+        order = self.archive_one()
+        admin = User.objects.create_superuser("admin", "admin@example.com", "motdepasse-123")
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:store_order_change', args=[order.id]))
+        self.assertRedirects(response, reverse('admin:store_archivedorder_change', args=[order.id]))
+        response = self.client.get(reverse('admin:store_order_change', args=['inconnue']))
+        self.assertRedirects(response, reverse('admin:index'))
+
+
+class WarmupTests(StoreTestCase):
+
+    def test_hottest_products_by_recent_units_sold(self):
+        hot, cold, unavailable = self.make_products(3)
+        Product.objects.filter(id=unavailable.id).update(available=False)
+        order = self.make_orders(self.user, 1, lines=0)[0]
+        old = self.make_orders(self.user, 1, lines=0)[0]
+        Order.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=365))
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=hot, price=hot.price, quantity=5),
+            OrderItem(order=order, product=cold, price=cold.price, quantity=1),
+            OrderItem(order=order, product=unavailable, price=hot.price, quantity=9),
+            OrderItem(order=old, product=cold, price=cold.price, quantity=50),
+        ])
+        self.assertEqual(
+            warmup.hottest_product_urls(limit=5, days=30), [hot.get_absolute_url(), cold.get_absolute_url()]
+        )
+
+    def test_templates_and_urls(self):
+        compiled, _ = warmup.warm_templates()
+        self.assertIn('store/product_detail.html', compiled)
+        self.assertIn('registration/login.html', compiled)
+        resolved, _ = warmup.warm_urls()
+        self.assertIn('store:home', resolved)
+        self.assertNotIn('store:product_detail', resolved)
+
+    def test_catalog_pages_are_cached(self):
+        self.make_products(3)
+        warmup.warm_caches()
+        with self.assertNumQueries(0):
+            self.client.get(reverse('store:product_list'), {'category': 'robes'})
+
+
+class WarmSiteTests(LiveServerTestCase):
+
+    def setUp(self):
+        category = Category.objects.create(name="Robes", slug="robes")
+        Product.objects.create(
+            name="Robe Été", slug="robe-ete", category=category,
+            description="Robe", price=Decimal('250.00'), stock=50,
+        )
+        page_cache().clear()
+
+    def test_command_fills_the_page_cache_through_http(self):
+        out, err = io.StringIO(), io.StringIO()
+        call_command('warm_caches', '--url', self.live_server_url, stdout=out, stderr=err)
+        self.assertIn("catalogue            3 élément(s)", out.getvalue())
+        self.assertIn("propre à chaque processus", err.getvalue())  # LocMem en test
+        with self.assertNumQueries(0):
+            self.client.get(reverse('store:product_list'), {'category': 'robes'})
+
+    def test_unreachable_site_fails(self):
+        with self.assertRaises(CommandError):
+            call_command('warm_caches', '--url', 'http://127.0.0.1:9', stderr=io.StringIO())
+
+    @override_settings(WARMUP_ON_STARTUP=True)
+    def test_startup_warmup_runs_inside_an_event_loop(self):
+        # uvicorn importe config/asgi.py depuis sa boucle d'événements
+        async def import_asgi_app():
+            warmup.warm_on_startup()
+
+        with self.assertNoLogs('store.warmup', 'ERROR'):
+            asyncio.run(import_asgi_app())
+        with self.assertNumQueries(0):
+            self.client.get(reverse('store:product_list'), {'category': 'robes'})
+
+    @override_settings(WARMUP_ON_STARTUP=True)
+    def test_startup_warmup_closes_its_connections(self):
+        # SQLite en mémoire partage sa connexion entre threads : on note qui ferme
+        closed_by = []
+        warmup.connections.close_all = lambda: closed_by.append(threading.current_thread().name)
+        try:
+            warmup.warm_on_startup()
+        finally:
+            del warmup.connections.close_all
+        self.assertEqual(closed_by, ['warmup'])
+
+
+@override_settings(LIVE_POLL_INTERVAL=0.01, LIVE_KEEPALIVE=5)
+class LiveStreamTests(StoreTestCase):
+
+    async def next_event(self, stream):
+        return (await asyncio.wait_for(anext(stream), 5)).decode()
+
+    async def test_price_and_stock_changes_are_pushed(self):
+        response = await self.async_client.get(reverse('store:live_products'), {'slug': 'robe-ete'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertTrue((await self.next_event(stream)).startswith('retry:'))
+
+        self.product.price = Decimal('199.00')
+        self.product.stock = 3
+        await self.product.asave()
+        event = await self.next_event(stream)
+        self.assertTrue(event.startswith('event: product\n'))
+        self.assertIn('"price":"199.00","stock":3,"available":true', event)
+
+        # Client déconnecté : le handler ASGI abandonne le flux, la boucle le finalise
+        await stream.aclose()
+        del response, stream
+        for _ in range(5):
+            gc.collect()
+            await asyncio.sleep(0)
+        self.assertEqual(live.product_feed.connections, 0)
+
+    async def test_connection_limit(self):
+        with self.settings(LIVE_MAX_CONNECTIONS=0):
+            response = await self.async_client.get(reverse('store:live_products'), {'slug': 'robe-ete'})
+        self.assertEqual(response.status_code, 503)
+
+    def test_wsgi_is_refused(self):
+        response = self.client.get(reverse('store:live_products'), {'slug': 'robe-ete'})
+        self.assertEqual(response.status_code, 501)
+
+    async def test_slow_subscriber_is_resynced(self):
+        feed = live.ProductChangeFeed()
+        with self.settings(LIVE_QUEUE_SIZE=2):
+            slow = feed.subscribe([self.product.id])
+            other = feed.subscribe([self.product.id + 1])
+        row = {'id': self.product.id, 'slug': 'robe-ete', 'price': Decimal('1'), 'stock': 1, 'available': True}
+        for stock in range(3):
+            feed.publish([dict(row, stock=stock)])
+        self.assertEqual(slow.queue.qsize(), 1)
+        self.assertIs(slow.queue.get_nowait(), live.RESYNC)
+        self.assertTrue(other.queue.empty())
+        self.assertEqual(feed.connections, 1)
+        feed.unsubscribe(other)
+
+    async def test_poller_failure_resyncs_subscribers(self):
+        feed = live.ProductChangeFeed()
+
+        async def broken_poll():
+            raise RuntimeError("base indisponible")
+
+        feed.poll = broken_poll
+        subscriber = feed.subscribe([self.product.id])
+        with self.assertLogs('store.live', 'ERROR'):
+            await asyncio.wait_for(feed._task, 5)
+        self.assertIs(subscriber.queue.get_nowait(), live.RESYNC)
+        self.assertEqual(feed.connections, 0)
+        self.assertIsNone(feed._task)
+
+
+class BulkPriceUpdateTests(StoreTestCase):
+
+    def test_only_changed_rows_are_written_per_batch(self):
+        products = self.make_products(5)
+        updates = {p.slug: {'price': p.price, 'stock': p.stock} for p in products}
+        updates[products[0].slug] = {'price': Decimal('9.99')}
+        updates[products[3].slug] = {'stock': 0, 'available': False}
+        updates['inconnu'] = {'price': Decimal('1.00')}
+        page_cache().set(VERSION_KEY, 0, None)
+
+        # 3 lots (savepoint, SELECT ... FOR UPDATE, release) + un UPDATE par lot modifié
+        with self.captureOnCommitCallbacks(execute=True), self.assertNumQueries(3 * 3 + 2):
+            report = apply_updates(updates, batch_size=2)
+
+        self.assertEqual((report.changed, report.unchanged, report.batches), (2, 3, 3))
+        self.assertEqual(report.unknown, ['inconnu'])
+        self.assertEqual(page_cache().get(VERSION_KEY), 2)  # une invalidation par lot modifié
+        self.assertEqual(Product.objects.get(id=products[0].id).price, Decimal('9.99'))
+        self.assertFalse(Product.objects.get(id=products[3].id).available)
+        self.assertEqual(Product.objects.get(id=products[1].id).updated_at, products[1].updated_at)
+
+    def test_command_reads_csv(self):
+        products = self.make_products(2)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as fh:
+            fh.write(f"slug;price;stock\n{products[0].slug};12,50;\n{products[1].slug};abc;4\n")
+        out, err = io.StringIO(), io.StringIO()
+        call_command('update_prices', fh.name, stdout=out, stderr=err)
+        self.assertEqual(Product.objects.get(id=products[0].id).price, Decimal('12.50'))
+        self.assertEqual(Product.objects.get(id=products[1].id).stock, 10)
+        self.assertIn('ligne 3', err.getvalue())
+        self.assertIn('1 produit(s) modifié(s)', out.getvalue())
+
+    def price_file(self, content):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as fh:
+            fh.write(content)
+        self.addCleanup(os.unlink, fh.name)
+        return fh.name
+
+    def test_dry_run_neither_writes_nor_locks(self):
+        path = self.price_file("slug,price\nrobe-ete,99\n")
+        out = io.StringIO()
+        # SQLite ignore select_for_update : on émet le FOR UPDATE comme MySQL le ferait
+        connection.features.has_select_for_update = True
+        self.addCleanup(delattr, connection.features, 'has_select_for_update')
+        with CaptureQueriesContext(connection) as queries:
+            call_command('update_prices', path, '--dry-run', stdout=out)
+        self.assertFalse(any('FOR UPDATE' in q['sql'] or q['sql'].startswith('UPDATE') for q in queries))
+        self.assertIn('1 produit(s) à modifier', out.getvalue())
+        self.assertEqual(Product.objects.get(id=self.product.id).price, Decimal('250.00'))
+
+    def test_command_invalidates_pages_for_every_process(self):
+        path = self.price_file("slug,price\nrobe-ete,99\n")
+        with tempfile.TemporaryDirectory() as location:
+            shared = {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+            with self.settings(CACHES={**settings.CACHES, 'pages': shared}):
+                other_worker = FileBasedCache(location, {})
+                version = other_worker.get(VERSION_KEY, 0)
+                with self.captureOnCommitCallbacks(execute=True):
+                    call_command('update_prices', path, stdout=io.StringIO())
+                self.assertEqual(other_worker.get(VERSION_KEY), version + 1)
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "motdepasse-123")
+        self.client.force_login(admin)
+        other = self.make_products(1)[0]
+        url = reverse('admin:store_product_changelist')
+        selection = {'action': 'bulk_update_prices', '_selected_action': [self.product.id]}
+
+        response = self.client.post(url, selection)
+        self.assertContains(response, 'name="apply"')
+
+        response = self.client.post(url, {**selection, 'apply': '1', 'percent': '-10'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Product.objects.get(id=self.product.id).price, Decimal('225.00'))
+
+        csv_file = SimpleUploadedFile('prix.csv', f"slug,stock\nrobe-ete,7\n{other.slug},1\n".encode())
+        self.client.post(url, {**selection, 'apply': '1', 'price_file': csv_file})
+        self.assertEqual(Product.objects.get(id=self.product.id).stock, 7)
+        self.assertEqual(Product.objects.get(id=other.id).stock, 10)  # hors sélection
+
+
+class AdminQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "motdepasse-123")
+        self.client.force_login(self.admin)
+
+    def test_product_changelist(self):
+        self.assertQueryBudgetStable(
+            self.make_products,
+            lambda: self.client.get(reverse('admin:store_product_changelist')),
+            sizes=(SMALL, 50),
+        )
+
+    def test_cart_changelist(self):
+        def seed(n):
+            Cart.objects.bulk_create(
+                Cart(user=User.objects.create_user(f"u{unique_number()}")) for _ in range(n)
+            )
+
+        self.assertQueryBudgetStable(
+            seed, lambda: self.client.get(reverse('admin:store_cart_changelist')), sizes=(SMALL, 50),
+        )
+
+    def test_cart_change_inlines(self):
+        cart = Cart.objects.create(user=self.user)
+        self.assertQueryBudgetStable(
+            lambda n: self.fill_cart(cart, n),
+            lambda: self.client.get(reverse('admin:store_cart_change', args=[cart.id])),
+            sizes=(SMALL, 50),
+        )
+
+    def test_order_change_inlines(self):
+        order = self.make_orders(self.user, 1)[0]
+        self.assertQueryBudgetStable(
+            lambda n: OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=p, price=p.price) for p in self.make_products(n)
+            ),
+            lambda: self.client.get(reverse('admin:store_order_change', args=[order.id])),
+            sizes=(SMALL, 50),
+        )
@@ -1,6 +1,6 @@
 # store/urls.py
 from django.urls import path
-from . import views
+from . import views, api, live
 
 app_name = 'store'
 
@@ -17,6 +17,17 @@ urlpatterns = [
     path('checkout/', views.checkout, name='checkout'),
     path('cart/remove/<int:item_id>/', views.remove_from_cart, name='remove_from_cart'),
 
+    path('sitemap.xml', views.sitemap_index, name='sitemap'),
+    path('sitemap-<int:shard>.xml', views.sitemap_shard, name='sitemap_shard'),
+    path('feeds/products.xml', views.product_feed, name='product_feed'),
+
+    path('api/products/', api.product_list, name='api_product_list'),
+    path('api/products/<slug:slug>/', api.product_detail, name='api_product_detail'),
+    path('api/cart/', api.cart, name='api_cart'),
+    path('api/autocomplete/', api.autocomplete, name='api_autocomplete'),
+
+    path('live/products/', live.product_stream, name='live_products'),
+
     
 
 ]
\ No newline at end of file
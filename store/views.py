@@ -1,14 +1,32 @@
+import gzip
+import os
+import uuid
+from datetime import timedelta
+from urllib.parse import quote
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q
-from .models import Product, Category, Cart, CartItem, Order, OrderItem
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q, F
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from .models import Product, Category, Cart, CartActionKey, CartItem, OrderItem
 from .forms import CheckoutForm, AddToCartForm
+from . import archive, feeds
+from .page_cache import cache_anonymous_page
+from .search import prefix_index
+from .storage import is_hashed_name
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+@cache_anonymous_page
 def home(request):
     featured_products = Product.objects.filter(available=True)[:8]
     categories = Category.objects.all()[:6]
@@ -19,8 +37,9 @@ def home(request):
     return render(request, 'store/home.html', context)
 
 
+@cache_anonymous_page
 def product_list(request):
-    products = Product.objects.filter(available=True)
+    products = Product.objects.filter(available=True).select_related('category')
     categories = Category.objects.all()
     
     # Filtrage par catégorie
@@ -43,6 +62,7 @@ def product_list(request):
     return render(request, 'store/product_list.html', context)
 
 
+@cache_anonymous_page
 def product_detail(request, slug):
     product = get_object_or_404(Product, slug=slug, available=True)
     form = AddToCartForm()
@@ -68,8 +88,12 @@ def get_guest_user():
     return guest
 
 
-def get_or_create_cart(request):
-    """Récupère ou crée un panier selon que l'utilisateur est connecté ou non"""
+def get_or_create_cart(request, create=True):
+    """Récupère ou crée un panier selon que l'utilisateur est connecté ou non
+
+    Avec create=False (pages en lecture seule), un invité qui n'a encore rien
+    ajouté obtient None : ni session ni panier ne sont créés pour lui.
+    """
     if request.user.is_authenticated:
         # Pour les utilisateurs connectés : UN SEUL panier par utilisateur
         # On prend celui qui existe déjà OU on en crée un nouveau
@@ -87,44 +111,102 @@ def get_or_create_cart(request):
             cart = Cart.objects.create(user=request.user, session_key=None)
     else:
         # Pour les invités : panier basé sur la session
-        guest_user = get_guest_user()
         session_key = request.session.session_key
         if not session_key:
+            if not create:
+                return None
             request.session.create()
             session_key = request.session.session_key
-        
+
+        guest_user = get_guest_user()
         cart = Cart.objects.filter(user=guest_user, session_key=session_key).first()
-        if not cart:
+        if not cart and create:
             cart = Cart.objects.create(user=guest_user, session_key=session_key)
     
     return cart
 
 
+def claim_idempotency_key(cart, key, scope=''):
+    """Réserve une clé d'idempotence ; False si la même action a déjà été traitée.
+
+    À appeler dans la transaction de l'action : si l'action échoue, le rollback
+    libère la clé et le retry peut passer.
+    """
+    if not key:
+        return True
+    expired = timezone.now() - timedelta(seconds=settings.CART_IDEMPOTENCY_TIMEOUT)
+    cart.action_keys.filter(created_at__lt=expired).delete()
+    try:
+        # La contrainte unique (cart, scope, key) arbitre les envois concurrents
+        with transaction.atomic():
+            CartActionKey.objects.create(cart=cart, scope=scope[:64], key=key[:64])
+    except IntegrityError:
+        return False
+    return True
+
+
+def add_product_to_cart(cart, product, quantity=1):
+    """Ajoute `quantity` exemplaires en une seule requête UPDATE ... SET quantity = quantity + n"""
+    items = CartItem.objects.filter(cart=cart, product=product)
+    if items.update(quantity=F('quantity') + quantity):
+        return
+    try:
+        # La contrainte unique (cart, product) arbitre les ajouts concurrents
+        with transaction.atomic():
+            CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+    except IntegrityError:
+        items.update(quantity=F('quantity') + quantity)
+
+
+def change_cart_item_quantity(cart, item_id, delta):
+    """Modifie la quantité d'un article de façon atomique ; le retire s'il tombe à zéro.
+
+    Retourne True si l'article est toujours dans le panier, False s'il a été retiré.
+    """
+    items = CartItem.objects.filter(id=item_id, cart=cart)
+    if delta >= 0:
+        if not items.update(quantity=F('quantity') + delta):
+            raise Http404("Article introuvable.")
+        return True
+    if items.filter(quantity__gt=-delta).update(quantity=F('quantity') + delta):
+        return True
+    if not items.delete()[0]:
+        raise Http404("Article introuvable.")
+    return False
+
+
+def remove_cart_item(cart, item_id):
+    """Retire un article du panier en une seule requête DELETE"""
+    if not CartItem.objects.filter(id=item_id, cart=cart).delete()[0]:
+        raise Http404("Article introuvable.")
+
+
 def add_to_cart(request, slug):
     """Ajoute un produit au panier (pour utilisateurs connectés et invités)"""
     product = get_object_or_404(Product, slug=slug, available=True)
-    
+
+    form = AddToCartForm(request.POST or None)
+    if not form.is_valid():
+        messages.error(request, "Quantité invalide.")
+        return redirect(product)
+
     # Créer ou récupérer le panier (fonctionne pour invités et connectés)
     cart = get_or_create_cart(request)
-    
-    # Ajouter ou mettre à jour l'article
-    cart_item, created = CartItem.objects.get_or_create(
-        cart=cart, 
-        product=product,
-        defaults={'quantity': 1}
-    )
-    
-    if not created:
-        cart_item.quantity += 1
-        cart_item.save()
 
-    messages.success(request, f"{product.name} ajouté au panier.")
+    # Un double-clic ou un renvoi du même formulaire ne rajoute rien
+    with transaction.atomic():
+        key = form.cleaned_data['idempotency_key']
+        if claim_idempotency_key(cart, key, scope=f"add:{product.id}"):
+            add_product_to_cart(cart, product, form.cleaned_data['quantity'])
+            messages.success(request, f"{product.name} ajouté au panier.")
     return redirect('store:cart_detail')
 
 
 def cart_detail(request):
     """Affiche le détail du panier"""
-    cart = get_or_create_cart(request)
+    cart = get_or_create_cart(request, create=False)
+    if cart is None:
+        return render(request, 'store/cart.html', {'cart': None, 'items': [], 'total': 0})
     items = cart.items.select_related('product').all()
     total = cart.get_total()
     
@@ -144,6 +226,7 @@ def cart_detail(request):
         'cart': cart,
         'items': items,
         'total': total,
+        'idempotency_key': uuid.uuid4().hex,
     }
     return render(request, 'store/cart.html', context)
 
@@ -152,35 +235,37 @@ def update_cart(request, item_id):
     """Met à jour la quantité d'un article dans le panier"""
     # Récupérer le panier de l'utilisateur
     cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-    
-    if request.method == 'POST':
-        action = request.POST.get('action')
-        
+
+    action = request.POST.get('action')
+    if request.method != 'POST' or action not in ('increase', 'decrease', 'remove'):
+        get_object_or_404(CartItem, id=item_id, cart=cart)
+        return redirect('store:cart_detail')
+
+    key = request.POST.get('idempotency_key')
+    # Article introuvable (404) : le rollback libère aussi la clé
+    with transaction.atomic():
+        if not claim_idempotency_key(cart, key, scope=f"update:{item_id}:{action}"):
+            return redirect('store:cart_detail')
+
         if action == 'increase':
-            cart_item.quantity += 1
-            cart_item.save()
+            change_cart_item_quantity(cart, item_id, 1)
             messages.success(request, "Quantité augmentée.")
         elif action == 'decrease':
-            if cart_item.quantity > 1:
-                cart_item.quantity -= 1
-                cart_item.save()
+            if change_cart_item_quantity(cart, item_id, -1):
                 messages.success(request, "Quantité diminuée.")
             else:
-                cart_item.delete()
                 messages.info(request, "Produit retiré du panier.")
-        elif action == 'remove':
-            cart_item.delete()
+        else:
+            remove_cart_item(cart, item_id)
             messages.info(request, "Produit retiré du panier.")
-    
+
     return redirect('store:cart_detail')
 
 
 def remove_from_cart(request, item_id):
     """Retire un article du panier"""
     cart = get_or_create_cart(request)
-    cart_item = get_object_or_404(CartItem, id=item_id, cart=cart)
-    cart_item.delete()
+    remove_cart_item(cart, item_id)
     messages.info(request, "Produit retiré du panier.")
     return redirect('store:cart_detail')
 
@@ -211,14 +296,19 @@ def checkout(request):
             order.total = total
             order.save()
 
-            # Créer les items de commande
-            for item in items:
-                OrderItem.objects.create(
+            # Créer les items de commande (un seul INSERT)
+            OrderItem.objects.bulk_create(
+                OrderItem(
                     order=order,
                     product=item.product,
                     price=item.product.price,
                     quantity=item.quantity
                 )
+                for item in items
+            )
+            # bulk_create n'émet pas post_save : les ventes sont comptées ici (voir signals.count_sale)
+            for item in items:
+                prefix_index.add_sales(item.product_id, item.product.category_id, item.quantity)
 
             # Vider le panier
             cart.items.all().delete()
@@ -240,7 +330,9 @@ def checkout(request):
 @login_required
 def order_success(request, order_id):
     """Page de confirmation de commande"""
-    order = get_object_or_404(Order, id=order_id, user=request.user)
+    order = archive.find_user_order(request.user, order_id)
+    if order is None:
+        raise Http404("Commande introuvable.")
     context = {
         'order': order,
     }
@@ -249,9 +341,87 @@ def order_success(request, order_id):
 
 @login_required
 def order_history(request):
-    """Historique des commandes de l'utilisateur"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
+    """Historique des commandes de l'utilisateur, paginé (commandes actives puis archivées)"""
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    orders, has_next = archive.user_orders_page(request.user, page, settings.ORDERS_PER_PAGE)
     context = {
         'orders': orders,
+        'page': page,
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if has_next else None,
     }
-    return render(request, 'store/order_history.html', context)
\ No newline at end of file
+    return render(request, 'store/order_history.html', context)
+
+
+def serve_feed(request, filename, generate):
+    """Sert le fichier gzip pré-construit s'il existe, sinon génère le document en flux"""
+    path = feeds.feeds_root() / filename
+    if path.exists():
+        if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+            response = FileResponse(open(path, 'rb'), content_type='application/xml')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = FileResponse(gzip.open(path, 'rb'), content_type='application/xml')
+        response['Vary'] = 'Accept-Encoding'
+        return response
+    base_url = request.build_absolute_uri('/').rstrip('/')
+    return StreamingHttpResponse(generate(base_url), content_type='application/xml')
+
+
+def sitemap_index(request):
+    """Index des shards du sitemap"""
+    return serve_feed(
+        request, 'sitemap.xml.gz',
+        lambda base_url: feeds.iter_sitemap_index(base_url, feeds.scan_shards())
+    )
+
+
+def sitemap_shard(request, shard):
+    """Un shard du sitemap (SITEMAP_SHARD_SIZE produits au plus)"""
+    return serve_feed(
+        request, feeds.shard_filename(shard),
+        lambda base_url: feeds.iter_sitemap_shard(base_url, shard)
+    )
+
+
+def product_feed(request):
+    """Flux produits pour Google Merchant"""
+    return serve_feed(request, 'products.xml.gz', feeds.iter_product_feed)
+
+
+def serve_media(request, path):
+    """Sert un fichier de MEDIA_ROOT en déléguant l'envoi des octets au serveur frontal.
+
+    Avec MEDIA_SENDFILE_HEADER = "X-Accel-Redirect" (nginx) ou "X-Sendfile"
+    (Apache/lighttpd), Django ne renvoie que des en-têtes ; sans, le fichier est
+    lu par le worker, ce qui n'est permis qu'en développement (DEBUG).
+    """
+    header = settings.MEDIA_SENDFILE_HEADER
+    if not header and not settings.DEBUG:
+        raise ImproperlyConfigured("MEDIA_SENDFILE_HEADER est requis quand DEBUG est désactivé.")
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Fichier introuvable.")
+    if not os.path.isfile(full_path):
+        raise Http404("Fichier introuvable.")
+
+    if header == 'X-Accel-Redirect':
+        response = HttpResponse(content_type='')
+        response[header] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+    elif header:
+        response = HttpResponse(content_type='')
+        response[header] = full_path
+    else:
+        response = FileResponse(open(full_path, 'rb'))
+
+    # Les noms adressés par contenu ne changent jamais de contenu
+    if is_hashed_name(path):
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24)
+    return response
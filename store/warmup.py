@@ -0,0 +1,226 @@
+# store/warmup.py
+"""Préchauffage après déploiement ou redémarrage (config/wsgi.py et `manage.py warm_caches`).
+
+Les premières requêtes d'un processus neuf paient la compilation des templates,
+la construction du résolveur d'URL, l'ouverture des connexions et des caches
+vides. Au démarrage de chaque worker (warm_on_startup), on fait ce travail avant de servir :
+
+- compilation de tous les templates de templates/store et templates/registration ;
+- résolution de toutes les URL nommées ;
+- connexion vérifiée vers chaque base ;
+- pages catalogue (accueil, liste, chaque catégorie) et index d'autocomplétion ;
+- pages des produits les plus vendus récemment, dans un pool de threads borné.
+
+`manage.py warm_caches` tourne dans son propre processus : il ne peut remplir
+que le cache de pages partagé, et le fait par de vraies requêtes HTTP vers
+SITE_URL (warm_site), servies par les workers en service.
+"""
+import functools
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connections
+from django.core.handlers.wsgi import WSGIHandler
+from django.db.models import Sum
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+from django.test import RequestFactory
+from django.urls import NoReverseMatch, get_resolver, reverse
+from django.utils import timezone
+
+from .models import Category, OrderItem
+from .search import prefix_index
+
+TEMPLATE_DIRS = ['store', 'registration']
+
+logger = logging.getLogger(__name__)
+
+
+def warm_templates():
+    """Compile chaque template : le chargeur en cache garde le résultat pour le processus"""
+    names, failures = [], []
+    for subdir in TEMPLATE_DIRS:
+        root = settings.BASE_DIR / 'templates' / subdir
+        for path in sorted(root.rglob('*.html')):
+            name = path.relative_to(settings.BASE_DIR / 'templates').as_posix()
+            try:
+                get_template(name)
+            except TemplateSyntaxError as exc:
+                failures.append(f"{name} : {exc}")
+            else:
+                names.append(name)
+    return names, failures
+
+
+def named_urls(resolver=None, namespace=''):
+    """Noms qualifiés (« store:home ») de toutes les routes, espaces de noms compris"""
+    resolver = resolver or get_resolver()
+    names = [namespace + key for key in resolver.reverse_dict if isinstance(key, str)]
+    for ns, (_, sub_resolver) in resolver.namespace_dict.items():
+        names.extend(named_urls(sub_resolver, f"{namespace}{ns}:"))
+    return names
+
+
+def warm_urls():
+    """Peuple le résolveur et inverse les routes sans argument"""
+    resolved = []
+    for name in named_urls():
+        try:
+            reverse(name)
+        except NoReverseMatch:
+            continue  # route à paramètres : le résolveur est tout de même construit
+        resolved.append(name)
+    return resolved, []
+
+
+def warm_connections():
+    for alias in connections:
+        connections[alias].ensure_connection()
+    return list(connections), []
+
+
+def hottest_product_urls(limit=None, days=None):
+    """Produits disponibles les plus vendus sur la période, par unités vendues"""
+    limit = settings.WARMUP_PRODUCT_PAGES if limit is None else limit
+    days = settings.WARMUP_SALES_DAYS if days is None else days
+    since = timezone.now() - timedelta(days=days)
+    slugs = (
+        OrderItem.objects.filter(order__created_at__gte=since, product__available=True)
+        .values('product__slug').annotate(sold=Sum('quantity')).order_by('-sold')
+        .values_list('product__slug', flat=True)[:limit]
+    )
+    return [reverse('store:product_detail', args=[slug]) for slug in slugs]
+
+
+def catalog_urls():
+    urls = [reverse('store:home'), reverse('store:product_list')]
+    urls.extend(
+        f"{reverse('store:product_list')}?category={slug}"
+        for slug in Category.objects.values_list('slug', flat=True)
+    )
+    return urls
+
+
+@functools.cache
+def wsgi_handler():
+    return WSGIHandler()
+
+
+def fetch(url):
+    """GET anonyme servi par le handler WSGI de production (middlewares et signaux
+    request_started/request_finished compris) : remplit le cache de pages"""
+    host = urlsplit(settings.SITE_URL).hostname or settings.ALLOWED_HOSTS[0]
+    environ = RequestFactory(SERVER_NAME=host).get(url).environ
+    statuses = []
+    response = wsgi_handler()(environ, lambda status, headers: statuses.append(status))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return url, int(statuses[0].split(' ', 1)[0])
+
+
+def fetch_in_thread(url):
+    try:
+        return fetch(url)
+    finally:
+        connections.close_all()  # connexions propres au thread du pool
+
+
+def fetch_remote(url):
+    """GET HTTP réel vers un worker en service ; URLError si le site est injoignable"""
+    request = urllib.request.Request(url, headers={'User-Agent': 'warm-caches'})
+    try:
+        with urllib.request.urlopen(request, timeout=settings.WARMUP_HTTP_TIMEOUT) as response:
+            response.read()
+            return url, response.status
+    except urllib.error.HTTPError as exc:
+        return url, exc.code
+
+
+def page_report(results):
+    results = list(results)
+    return (
+        [url for url, status in results if status < 400],
+        [f"{url} : HTTP {status}" for url, status in results if status >= 400],
+    )
+
+
+def warm_pages(urls, workers=None, fetch=fetch_in_thread):
+    """Pages servies en parallèle par au plus WARMUP_THREADS threads"""
+    workers = workers or settings.WARMUP_THREADS
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return page_report(pool.map(fetch, urls))
+
+
+def warm_search():
+    prefix_index.rebuild()
+    return ['index'], []
+
+
+def timed(report, label, func):
+    start = time.perf_counter()
+    items, failures = func()
+    report.append((label, items, failures, time.perf_counter() - start))
+
+
+def warm_caches():
+    """Exécute toutes les étapes ; retourne [(étape, éléments préchauffés, échecs, secondes)]"""
+    report = []
+    timed(report, "connexions", warm_connections)
+    timed(report, "templates", warm_templates)
+    timed(report, "urls", warm_urls)
+    timed(report, "autocomplétion", warm_search)
+    timed(report, "catalogue", lambda: page_report(fetch(url) for url in catalog_urls()))
+    timed(report, "produits", lambda: warm_pages(hottest_product_urls()))
+    return report
+
+
+def warm_site(base_url=None):
+    """Remplit le cache de pages partagé par des requêtes HTTP vers le site en service"""
+    base_url = (base_url or settings.SITE_URL).rstrip('/')
+    report = []
+    timed(report, "catalogue", lambda: warm_pages(
+        [base_url + url for url in catalog_urls()], fetch=fetch_remote,
+    ))
+    timed(report, "produits", lambda: warm_pages(
+        [base_url + url for url in hottest_product_urls()], fetch=fetch_remote,
+    ))
+    return report
+
+
+def warm_on_startup():
+    """Appelé par config/wsgi.py et config/asgi.py ; un échec ne doit pas empêcher de servir.
+
+    Le préchauffage tourne dans un thread dédié, attendu jusqu'au bout : uvicorn
+    importe config/asgi.py depuis sa boucle d'événements, où l'ORM synchrone est
+    interdit. Ce thread ferme ses connexions en partant : le processus principal
+    n'en garde aucune à transmettre aux workers forkés (gunicorn --preload).
+    """
+    if not settings.WARMUP_ON_STARTUP:
+        return
+    thread = threading.Thread(target=warm_and_log, name='warmup')
+    thread.start()
+    thread.join()
+
+
+def warm_and_log():
+    try:
+        report = warm_caches()
+    except Exception:
+        logger.exception("Préchauffage au démarrage interrompu")
+        return
+    finally:
+        connections.close_all()
+    for label, items, failures, seconds in report:
+        logger.info("Préchauffage %s : %d en %.0f ms", label, len(items), seconds * 1000)
+        for failure in failures:
+            logger.warning("Préchauffage %s, échec : %s", label, failure)